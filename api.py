@@ -1,34 +1,317 @@
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import JSONResponse
-from supabase import create_client, Client
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from typing import Optional, List, Dict, Any
 import os
 from datetime import datetime
+import csv
+import io
 import json
-import subprocess
+import base64
+import time
+import asyncio
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from prometheus_client import Histogram
+from utils import metrics
+from utils.feed_health import FeedHealth
+from utils.near_duplicates import NearDuplicateIndex
+from utils.response_cache import ResponseCache
+from utils.search_index import SearchIndex
+from utils.stats_aggregates import ArticleAggregates
+from utils.storage import COLUMNS, FILTER_COLUMNS, create_storage
+from utils.update_jobs import UpdateJobRunner
 from dotenv import load_dotenv
 load_dotenv()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="News Feed API",
-    description="API to fetch paginated news data from Supabase",
+    description="API to fetch paginated news data from Supabase or a local SQLite store",
     version="1.0.0"
 )
 
-# Supabase configuration - Replace with your actual values
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_ANON_KEY")
-
-# Initialize Supabase client
+# Storage backend from STORAGE_BACKEND (Supabase by default, or a local SQLite file)
 try:
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    storage = create_storage()
 except Exception as e:
-    print(f"Error initializing Supabase client: {e}")
-    supabase = None
+    print(f"Error initializing storage: {e}")
+    storage = None
 
 # Constants
 NEWS_PER_PAGE = 100
+DB_WORKERS = int(os.getenv("DB_WORKERS", "16"))
+
+# Rows per storage round trip for /api/news/export; one chunk is all an export
+# holds in memory, however many rows it streams
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+EXPORT_FIELDS = ("id",) + COLUMNS
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+# Both storage backends are synchronous, so queries run on a dedicated pool
+# instead of blocking the event loop; Supabase workers share the client's
+# pooled connections, SQLite workers keep one connection per thread
+db_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="storage")
+
+# Served at GET /metrics, next to the scraper's own metrics once POST /update has run it in-process
+request_seconds = Histogram(
+    "api_request_seconds", "Request latency by route template, method and status", ("route", "method", "status"),
+    buckets=metrics.DEFAULT_BUCKETS
+)
+db_call_seconds = Histogram(
+    "api_db_call_seconds", "Time inside a storage or index call", ("operation",), buckets=metrics.DEFAULT_BUCKETS
+)
+db_wait_seconds = Histogram(
+    "api_db_wait_seconds", "Time a storage call queued for a free database worker", buckets=metrics.DEFAULT_BUCKETS
+)
+
+async def run_db(fn, *args):
+    """
+    Run a blocking storage call on the database pool without blocking the event loop
+
+    The time spent waiting for a worker and inside fn are recorded separately,
+    by fn's qualified name (e.g. SQLiteStorage.fetch_page).
+
+    Args:
+        fn: Storage method (or any blocking callable)
+        args: Positional arguments for fn
+
+    Returns:
+        Whatever fn returns
+    """
+    operation = getattr(fn, "__qualname__", type(fn).__name__)
+    submitted = time.perf_counter()
+
+    def timed_call():
+        started = time.perf_counter()
+        db_wait_seconds.observe(started - submitted)
+        try:
+            return fn(*args)
+        finally:
+            db_call_seconds.labels(operation=operation).observe(time.perf_counter() - started)
+
+    return await asyncio.get_running_loop().run_in_executor(db_executor, timed_call)
+
+class RequestLatencyMiddleware:
+    """
+    Records every HTTP request in api_request_seconds
+
+    Plain ASGI rather than @app.middleware, which wraps each response in an
+    extra stream; requests are labelled by route template (/api/news/{page})
+    rather than raw path, so every page number lands in one series, and
+    timed until the last body chunk is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_and_record_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record_status)
+        finally:
+            route = scope.get("route")
+            request_seconds.labels(
+                route=route.path if route is not None else "unmatched", method=scope["method"], status=status
+            ).observe(time.perf_counter() - started)
+
+app.add_middleware(RequestLatencyMiddleware)
+
+# Read endpoints only change when a scrape lands, so their rendered bodies are
+# cached in-process and dropped by POST /update
+response_cache = ResponseCache()
+
+COUNT_PATTERN = "^(none|estimated|exact)$"
+
+# Full-text index the database scraper fills at ingest, for search?q=
+search_index = SearchIndex()
+
+# Per-dimension article counts the database scraper maintains at ingest, for /api/stats
+stats_aggregates = ArticleAggregates()
+
+# Near-duplicate clusters the database scraper assigns at ingest, for collapse=true
+near_duplicates = NearDuplicateIndex()
+
+# Total counts per filter set, reused until the response TTL runs out or POST /update;
+# bounded like the response cache since the filters come from clients
+count_cache = ResponseCache()
+
+async def count_records(filters, method="exact"):
+    """
+    Count rows matching filters
+
+    Args:
+        filters: Search filters (category, source, country, language, author, search_title)
+        method: "exact", "estimated" (planner estimate, cheap on big tables) or
+            "none" to skip counting
+
+    Returns:
+        Row count, or None when method is "none"
+    """
+    if method == "none":
+        return None
+    key = json.dumps([method, sorted((name, value) for name, value in filters.items() if value)])
+    cached = count_cache.get(key)
+    if cached is not None:
+        return json.loads(cached.body)
+
+    total_records = await run_db(storage.count, filters, method)
+    count_cache.set(key, json.dumps(total_records).encode())
+    return total_records
+
+def encode_cursor(row):
+    """Opaque cursor pointing just past row in (scraped_timestamp, id) order"""
+    position = json.dumps([row["scraped_timestamp"], row["id"]])
+    return base64.urlsafe_b64encode(position.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        scraped_timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return str(scraped_timestamp), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def fetch_keyset_page(filters, cursor, limit):
+    """
+    Fetch one page in (scraped_timestamp desc, id desc) order after cursor
+
+    Returns:
+        Tuple of (rows, next_cursor); next_cursor is None on the last page
+    """
+    position = decode_cursor(cursor) if cursor else None
+    try:
+        if position is None:
+            rows = await run_db(storage.fetch_page, filters, 0, limit + 1)
+        else:
+            rows = await run_db(storage.fetch_after, filters, position, limit + 1)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching news data: {str(e)}")
+
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def matches_filters(row, filters):
+    """Whether a row passes filters the same way the storage query would"""
+    for column in FILTER_COLUMNS:
+        if filters.get(column) and row.get(column) != filters[column]:
+            return False
+    search_title = filters.get("search_title")
+    return not search_title or search_title.lower() in (row.get("title") or "").lower()
+
+async def collapse_rows(rows, filters):
+    """
+    Keep one article per near-duplicate cluster: its newest member matching filters
+
+    The rule only depends on the cluster, not on the page, so a story shows up
+    once however the results are paged. Kept rows get duplicate_count, the
+    number of articles in their cluster.
+
+    Args:
+        rows: Rows in (scraped_timestamp desc, id desc) order
+        filters: The filters the rows were fetched with
+
+    Returns:
+        The kept rows, in the same order
+    """
+    clusters = await run_db(near_duplicates.clusters_of, [row["guid"] for row in rows if row.get("guid")])
+    members = await run_db(near_duplicates.members_of, clusters.values())
+    others = [guid for guids in members.values() for guid in guids]
+    member_rows = {row["guid"]: row for row in await run_db(storage.fetch_by_guids, others)} if others else {}
+
+    kept = []
+    for row in rows:
+        cluster = clusters.get(row.get("guid"))
+        guids = members.get(cluster, [])
+        newest = max(
+            (member_rows[guid] for guid in guids if guid in member_rows and matches_filters(member_rows[guid], filters)),
+            key=lambda member: (member["scraped_timestamp"], member["id"]),
+            default=row
+        )
+        if newest["id"] == row["id"]:
+            kept.append({**row, "duplicate_count": max(len(guids), 1)})
+    return kept
+
+async def fetch_collapsed_page(filters, cursor, limit):
+    """
+    Keyset page with one article per near-duplicate cluster
+
+    Scans storage in (scraped_timestamp desc, id desc) order from cursor,
+    dropping the rows collapse_rows() doesn't keep, until limit rows are kept.
+
+    Returns:
+        Tuple of (rows, next_cursor); next_cursor points past the last row
+        scanned, and is None once storage is exhausted
+    """
+    position = decode_cursor(cursor) if cursor else None
+    kept = []
+    try:
+        while len(kept) < limit:
+            chunk_size = 2 * (limit - len(kept)) + 10
+            if position is None:
+                rows = await run_db(storage.fetch_page, filters, 0, chunk_size)
+            else:
+                rows = await run_db(storage.fetch_after, filters, position, chunk_size)
+            if not rows:
+                return kept, None
+            for row in await collapse_rows(rows, filters):
+                kept.append(row)
+                position = (row["scraped_timestamp"], row["id"])
+                if len(kept) == limit:
+                    break
+            if len(kept) < limit:
+                if len(rows) < chunk_size:
+                    return kept, None
+                position = (rows[-1]["scraped_timestamp"], rows[-1]["id"])
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching news data: {str(e)}")
+    return kept, encode_cursor({"scraped_timestamp": position[0], "id": position[1]})
+
+async def cached_json_response(request: Request, build_response):
+    """
+    Serve a JSON body from the response cache, building it on a miss
+
+    Args:
+        request: Incoming request; path and query params form the cache key
+        build_response: Coroutine function returning the response dict; an HTTPException
+            it raises is passed through and nothing is cached
+
+    Returns:
+        JSON response with ETag and Cache-Control headers, or an empty 304 when
+        the client's If-None-Match already matches
+    """
+    key = ResponseCache.key_for(request.url.path, request.query_params)
+    entry = response_cache.get(key)
+    cache_status = "HIT"
+    if entry is None:
+        cache_status = "MISS"
+        content = await build_response()
+        # The ETag hashes the serialized data without the build timestamp, so it
+        # only changes when the data does, not each time the entry expires
+        data = {name: value for name, value in content.items() if name != "timestamp"}
+        entry = response_cache.set(key, JSONResponse(content=content).body, JSONResponse(content=data).body)
+
+    headers = {
+        "ETag": entry.etag,
+        "Cache-Control": f"public, max-age={response_cache.ttl_seconds}",
+        "X-Cache": cache_status
+    }
+    if request.headers.get("if-none-match") == entry.etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
 
 @app.get("/")
 async def root():
@@ -38,7 +321,14 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "/api/news/{page}": "Get paginated news data",
+            "/api/news": "Get news with cursor pagination",
             "/api/news/search": "Search news with filters",
+            "/api/news/export": "Stream every matching article as NDJSON or CSV",
+            "/api/feeds/health": "Per-feed health and circuit breaker state",
+            "/api/cache/stats": "Response cache hit/miss counters",
+            "/metrics": "Prometheus metrics: request latency, storage call timings and scraper stages",
+            "/update": "Start a background scrape (POST)",
+            "/update/{job_id}": "Progress of a background scrape",
             "/health": "Health check"
         }
     }
@@ -46,22 +336,23 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    if supabase is None:
-        raise HTTPException(status_code=500, detail="Supabase client not initialized")
+    if storage is None:
+        raise HTTPException(status_code=500, detail="Storage not initialized")
     
     try:
         # Test connection with a simple count query
-        result = supabase.table("news_feed").select("id", count="exact").limit(1).execute()
+        total_records = await run_db(storage.count)
         return {
             "status": "healthy",
             "database": "connected",
-            "total_records": result.count if hasattr(result, 'count') else "unknown"
+            "storage": storage.name,
+            "total_records": total_records
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Database connection failed: {str(e)}")
 
-@app.get("/api/news/{page}")
-async def get_news_page(page: int):
+@app.get("/api/news/{page:int}")
+async def get_news_page(request: Request, page: int):
     """
     Get paginated news data
     
@@ -71,59 +362,113 @@ async def get_news_page(page: int):
     Returns:
         JSON response with news data and pagination info
     """
-    if supabase is None:
-        raise HTTPException(status_code=500, detail="Supabase client not initialized")
+    if storage is None:
+        raise HTTPException(status_code=500, detail="Storage not initialized")
     
     if page < 1:
         raise HTTPException(status_code=400, detail="Page number must be greater than 0")
     
-    try:
-        # Calculate offset
-        offset = (page - 1) * NEWS_PER_PAGE
+    async def build_response():
+        try:
+            # Calculate offset
+            offset = (page - 1) * NEWS_PER_PAGE
         
-        # Get total count for pagination info
-        count_result = supabase.table("news_feed").select("id", count="exact").execute()
-        total_records = count_result.count if hasattr(count_result, 'count') else 0
+            # Total count (cached between scrapes) and the page itself, fetched concurrently
+            total_records, news_data = await asyncio.gather(
+                count_records({}, "exact"),
+                run_db(storage.fetch_page, {}, offset, NEWS_PER_PAGE)
+            )
         
-        # Calculate pagination info
-        total_pages = (total_records + NEWS_PER_PAGE - 1) // NEWS_PER_PAGE
-        has_next = page < total_pages
-        has_previous = page > 1
+            # Calculate pagination info
+            total_pages = (total_records + NEWS_PER_PAGE - 1) // NEWS_PER_PAGE
+            has_next = page < total_pages
+            has_previous = page > 1
         
-        # Fetch paginated data
-        result = supabase.table("news_feed")\
-            .select("*")\
-            .order("scraped_timestamp", desc=True)\
-            .range(offset, offset + NEWS_PER_PAGE - 1)\
-            .execute()
+            # Format response
+            response_data = {
+                "success": True,
+                "data": news_data,
+                "pagination": {
+                    "current_page": page,
+                    "total_pages": total_pages,
+                    "total_records": total_records,
+                    "records_per_page": NEWS_PER_PAGE,
+                    "records_in_current_page": len(news_data),
+                    "has_next": has_next,
+                    "has_previous": has_previous,
+                    "next_page": page + 1 if has_next else None,
+                    "previous_page": page - 1 if has_previous else None
+                },
+                "timestamp": datetime.utcnow().isoformat()
+            }
         
-        news_data = result.data if result.data else []
+            return response_data
         
-        # Format response
-        response_data = {
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error fetching news data: {str(e)}")
+
+    return await cached_json_response(request, build_response)
+
+@app.get("/api/news")
+async def get_news_by_cursor(
+    request: Request,
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the previous page's next_cursor"),
+    limit: int = Query(NEWS_PER_PAGE, ge=1, le=500, description="Records per page"),
+    total: str = Query("none", pattern=COUNT_PATTERN, description="Total count: none, estimated or exact"),
+    collapse: bool = Query(False, description="One article per near-duplicate cluster")
+):
+    """
+    Get news with keyset (cursor) pagination
+
+    Each page seeks straight past the previous page's last (scraped_timestamp, id)
+    instead of skipping an offset, so deep pages cost the same as the first one.
+
+    Args:
+        cursor: next_cursor from the previous page; omit for the first page
+        limit: Number of records per page (max 500)
+        total: Whether to include a total count, and how exact it must be
+            (always none with collapse, which would need the clusters counted)
+        collapse: Return only the newest article of each near-duplicate
+            cluster, with duplicate_count on every row
+
+    Returns:
+        JSON response with news data and the cursor for the next page
+    """
+    if storage is None:
+        raise HTTPException(status_code=500, detail="Storage not initialized")
+
+    async def build_response():
+        page_result, total_records = await asyncio.gather(
+            fetch_collapsed_page({}, cursor, limit) if collapse else fetch_keyset_page({}, cursor, limit),
+            count_records({}, "none" if collapse else total),
+            return_exceptions=True
+        )
+        if isinstance(page_result, Exception):
+            raise page_result
+        if isinstance(total_records, Exception):
+            raise HTTPException(status_code=500, detail=f"Error counting news data: {str(total_records)}")
+        news_data, next_cursor = page_result
+
+        return {
             "success": True,
             "data": news_data,
             "pagination": {
-                "current_page": page,
-                "total_pages": total_pages,
-                "total_records": total_records,
-                "records_per_page": NEWS_PER_PAGE,
+                "cursor": cursor,
+                "next_cursor": next_cursor,
+                "has_next": next_cursor is not None,
+                "records_per_page": limit,
                 "records_in_current_page": len(news_data),
-                "has_next": has_next,
-                "has_previous": has_previous,
-                "next_page": page + 1 if has_next else None,
-                "previous_page": page - 1 if has_previous else None
+                "total_records": total_records,
+                "total_is_estimate": total == "estimated" and not collapse
             },
             "timestamp": datetime.utcnow().isoformat()
         }
-        
-        return JSONResponse(content=response_data)
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching news data: {str(e)}")
+
+    return await cached_json_response(request, build_response)
 
 @app.get("/api/news/search")
 async def search_news(
+    request: Request,
     page: int = Query(1, ge=1, description="Page number"),
     category: Optional[str] = Query(None, description="Filter by category"),
     source: Optional[str] = Query(None, description="Filter by source"),
@@ -131,7 +476,11 @@ async def search_news(
     language: Optional[str] = Query(None, description="Filter by language"),
     author: Optional[str] = Query(None, description="Filter by author"),
     search_title: Optional[str] = Query(None, description="Search in title"),
-    limit: int = Query(NEWS_PER_PAGE, ge=1, le=500, description="Records per page")
+    q: Optional[str] = Query(None, min_length=1, description="Full-text search over title, summary and category, ranked by relevance"),
+    limit: int = Query(NEWS_PER_PAGE, ge=1, le=500, description="Records per page"),
+    cursor: Optional[str] = Query(None, description="Keyset cursor; when set, page is ignored"),
+    total: str = Query("exact", pattern=COUNT_PATTERN, description="Total count: none, estimated or exact"),
+    collapse: bool = Query(False, description="One article per near-duplicate cluster")
 ):
     """
     Search and filter news data with pagination
@@ -144,94 +493,276 @@ async def search_news(
         language: Filter by language
         author: Filter by author
         search_title: Search term in title
+        q: Full-text query; every word must match title, summary or category
+            as a prefix, and results come back best match first
         limit: Number of records per page (max 500)
+        cursor: next_cursor from a previous response, to page by keyset instead of offset
+        total: Whether to include a total count, and how exact it must be
+            (not available with collapse)
+        collapse: Return one article per near-duplicate cluster (the newest
+            match, or the best-ranked one with q), with duplicate_count on
+            every row; without q, pages after the first are reached by cursor
     
     Returns:
         JSON response with filtered news data and pagination info
     """
-    if supabase is None:
-        raise HTTPException(status_code=500, detail="Supabase client not initialized")
+    if storage is None:
+        raise HTTPException(status_code=500, detail="Storage not initialized")
     
-    try:
-        # Build query
-        query = supabase.table("news_feed").select("*")
-        count_query = supabase.table("news_feed").select("id", count="exact")
-        
-        # Apply filters
-        if category:
-            query = query.eq("category", category)
-            count_query = count_query.eq("category", category)
-        
-        if source:
-            query = query.eq("source", source)
-            count_query = count_query.eq("source", source)
-        
-        if country:
-            query = query.eq("country", country)
-            count_query = count_query.eq("country", country)
-        
-        if language:
-            query = query.eq("language", language)
-            count_query = count_query.eq("language", language)
-        
-        if author:
-            query = query.eq("author", author)
-            count_query = count_query.eq("author", author)
-        
-        if search_title:
-            query = query.ilike("title", f"%{search_title}%")
-            count_query = count_query.ilike("title", f"%{search_title}%")
-        
-        # Get total count
-        count_result = count_query.execute()
-        total_records = count_result.count if hasattr(count_result, 'count') else 0
-        
-        # Calculate pagination
+    filters = {
+        "category": category,
+        "source": source,
+        "country": country,
+        "language": language,
+        "author": author,
+        "search_title": search_title,
+        "q": q
+    }
+    if q is not None and cursor is not None:
+        raise HTTPException(status_code=400, detail="Cursor paging is not available for ranked search, use page")
+    if collapse and q is None and cursor is None and page > 1:
+        raise HTTPException(status_code=400, detail="Collapsed results are paged by cursor, use next_cursor")
+
+    async def fetch_offset_page():
+        # Fetch one extra row so has_next is known without a count
         offset = (page - 1) * limit
-        total_pages = (total_records + limit - 1) // limit
-        has_next = page < total_pages
-        has_previous = page > 1
+        rows = await run_db(storage.fetch_page, filters, offset, limit + 1)
+        news_data = rows[:limit]
+        next_cursor = encode_cursor(news_data[-1]) if len(rows) > limit else None
+        return news_data, next_cursor
+
+    async def fetch_ranked_page():
+        # The index ranks and counts the matches, storage supplies the rows
+        offset = (page - 1) * limit
+        guids, total_records = await run_db(search_index.search, q, filters, limit + 1, offset, total != "none")
+        page_guids = guids[:limit]
+        news_data = []
+        if page_guids:
+            rows_by_guid = {row["guid"]: row for row in await run_db(storage.fetch_by_guids, page_guids)}
+            news_data = [rows_by_guid[guid] for guid in page_guids if guid in rows_by_guid]
+        return news_data, len(guids) > limit, total_records
+
+    async def fetch_ranked_collapsed_page():
+        # Best-ranked member of each cluster; the pages before this one are
+        # re-ranked to know which clusters they already used
+        wanted = page * limit + 1
+        picked = []
+        picked_clusters = set()
+        offset = 0
+        chunk_size = max(200, wanted)
+        while len(picked) < wanted:
+            guids, _ = await run_db(search_index.search, q, filters, chunk_size, offset, False)
+            clusters = await run_db(near_duplicates.clusters_of, guids)
+            for guid in guids:
+                cluster = clusters.get(guid, guid)
+                if cluster not in picked_clusters:
+                    picked_clusters.add(cluster)
+                    picked.append((guid, cluster))
+            if len(guids) < chunk_size:
+                break
+            offset += chunk_size
+
+        page_picks = picked[(page - 1) * limit:page * limit]
+        news_data = []
+        if page_picks:
+            rows_by_guid = {row["guid"]: row for row in await run_db(storage.fetch_by_guids, [guid for guid, _ in page_picks])}
+            members = await run_db(near_duplicates.members_of, [cluster for _, cluster in page_picks])
+            news_data = [
+                {**rows_by_guid[guid], "duplicate_count": len(members.get(cluster, [guid]))}
+                for guid, cluster in page_picks if guid in rows_by_guid
+            ]
+        return news_data, len(picked) > page * limit, None
+
+    async def build_response():
+        if q is not None:
+            # Ranking and counting happen in the same index query
+            (page_result,) = await asyncio.gather(
+                fetch_ranked_collapsed_page() if collapse else fetch_ranked_page(), return_exceptions=True
+            )
+            total_records = None
+        else:
+            # The page and the total count (cached, and optional) don't depend on each other
+            if collapse:
+                page_query = fetch_collapsed_page(filters, cursor, limit)
+            elif cursor is not None:
+                page_query = fetch_keyset_page(filters, cursor, limit)
+            else:
+                page_query = fetch_offset_page()
+            page_result, total_records = await asyncio.gather(
+                page_query,
+                count_records(filters, "none" if collapse else total),
+                return_exceptions=True
+            )
+        if isinstance(page_result, HTTPException):
+            raise page_result
+        try:
+            for outcome in (page_result, total_records):
+                if isinstance(outcome, Exception):
+                    raise outcome
+            if q is not None:
+                news_data, has_next, total_records = page_result
+                next_cursor = None
+            else:
+                news_data, next_cursor = page_result
+                has_next = next_cursor is not None
+            total_pages = (total_records + limit - 1) // limit if total_records is not None else None
         
-        # Execute main query with pagination
-        result = query.order("scraped_timestamp", desc=True)\
-            .range(offset, offset + limit - 1)\
-            .execute()
+            # Format response
+            response_data = {
+                "success": True,
+                "data": news_data,
+                "filters": filters,
+                "pagination": {
+                    "current_page": page if cursor is None else None,
+                    "total_pages": total_pages,
+                    "total_records": total_records,
+                    "total_is_estimate": total == "estimated" and q is None and not collapse,
+                    "records_per_page": limit,
+                    "records_in_current_page": len(news_data),
+                    "has_next": has_next,
+                    "has_previous": page > 1 if cursor is None else None,
+                    "next_page": page + 1 if has_next and cursor is None and (q is not None or not collapse) else None,
+                    "previous_page": page - 1 if page > 1 and cursor is None else None,
+                    "next_cursor": next_cursor
+                },
+                "timestamp": datetime.utcnow().isoformat()
+            }
         
-        news_data = result.data if result.data else []
-        
-        # Format response
-        response_data = {
-            "success": True,
-            "data": news_data,
-            "filters": {
-                "category": category,
-                "source": source,
-                "country": country,
-                "language": language,
-                "author": author,
-                "search_title": search_title
-            },
-            "pagination": {
-                "current_page": page,
-                "total_pages": total_pages,
-                "total_records": total_records,
-                "records_per_page": limit,
-                "records_in_current_page": len(news_data),
-                "has_next": has_next,
-                "has_previous": has_previous,
-                "next_page": page + 1 if has_next else None,
-                "previous_page": page - 1 if has_previous else None
-            },
-            "timestamp": datetime.utcnow().isoformat()
-        }
-        
-        return JSONResponse(content=response_data)
+            return response_data
         
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error searching news data: {str(e)}")
+
+    return await cached_json_response(request, build_response)
+
+async def export_chunks(filters, q, columns):
+    """
+    Yield the rows matching filters, EXPORT_CHUNK_SIZE at a time
+
+    Without q, rows come newest first, each chunk seeking past the last one
+    by (scraped_timestamp, id); with q, best match first from the search index.
+    """
+    if q is None:
+        rows = await run_db(storage.fetch_page, filters, 0, EXPORT_CHUNK_SIZE, columns)
+        while rows:
+            yield rows
+            if len(rows) < EXPORT_CHUNK_SIZE:
+                return
+            last = rows[-1]
+            rows = await run_db(
+                storage.fetch_after, filters, (last["scraped_timestamp"], last["id"]), EXPORT_CHUNK_SIZE, columns
+            )
+    else:
+        offset = 0
+        while True:
+            guids, _ = await run_db(search_index.search, q, filters, EXPORT_CHUNK_SIZE, offset, False)
+            if guids:
+                rows_by_guid = {row["guid"]: row for row in await run_db(storage.fetch_by_guids, guids)}
+                yield [rows_by_guid[guid] for guid in guids if guid in rows_by_guid]
+            if len(guids) < EXPORT_CHUNK_SIZE:
+                return
+            offset += EXPORT_CHUNK_SIZE
+
+def encode_export_rows(rows, export_format, fields, header=False):
+    """NDJSON lines, or CSV records (after a header row if asked), for rows projected onto fields"""
+    if export_format == "ndjson":
+        return "".join(
+            json.dumps({field: row.get(field) for field in fields}, ensure_ascii=False, default=str) + "\n" for row in rows
+        ).encode("utf-8")
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(fields)
+    writer.writerows([row.get(field) for field in fields] for row in rows)
+    return buffer.getvalue().encode("utf-8")
+
+@app.get("/api/news/export")
+async def export_news(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$", description="ndjson or csv"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to include, in order; all by default"),
+    compress: bool = Query(False, alias="gzip", description="gzip the body (Content-Encoding: gzip)"),
+    category: Optional[str] = Query(None, description="Filter by category"),
+    source: Optional[str] = Query(None, description="Filter by source"),
+    country: Optional[str] = Query(None, description="Filter by country"),
+    language: Optional[str] = Query(None, description="Filter by language"),
+    author: Optional[str] = Query(None, description="Filter by author"),
+    search_title: Optional[str] = Query(None, description="Search in title"),
+    q: Optional[str] = Query(None, min_length=1, description="Full-text search; rows come best match first")
+):
+    """
+    Stream every article matching the search_news filters
+
+    Rows are read from storage a chunk at a time by keyset and written out as
+    they arrive, so memory stays flat whatever the size of the export, and no
+    count query is run. Responses are not cached. If storage fails part-way
+    the connection is dropped rather than the body ended, so a truncated
+    export never looks complete.
+
+    Args:
+        export_format: ndjson (one JSON object per line) or csv (with a header row)
+        fields: Columns to include, e.g. title,news_url,scraped_timestamp
+        compress: gzip the stream; clients that accept gzip decompress it transparently
+        category, source, country, language, author, search_title, q: As for /api/news/search
+
+    Returns:
+        Streaming NDJSON or CSV attachment, newest first (best match first with q)
+    """
+    if storage is None:
+        raise HTTPException(status_code=500, detail="Storage not initialized")
+
+    columns = [field.strip() for field in fields.split(",") if field.strip()] if fields else list(EXPORT_FIELDS)
+    unknown = [field for field in columns if field not in EXPORT_FIELDS]
+    if unknown or not columns:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields {', '.join(unknown) or '(none given)'}; choose from {', '.join(EXPORT_FIELDS)}"
+        )
+    filters = {
+        "category": category,
+        "source": source,
+        "country": country,
+        "language": language,
+        "author": author,
+        "search_title": search_title
+    }
+
+    # The first chunk is read before answering, so a storage that is down
+    # still gets a proper error status
+    chunks = export_chunks(filters, q, None if fields is None else columns)
+    try:
+        first_rows = await anext(chunks, [])
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error searching news data: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error exporting news data: {str(e)}")
+
+    async def stream():
+        loop = asyncio.get_running_loop()
+        compressor = zlib.compressobj(wbits=31) if compress else None  # wbits=31: gzip framing
+        exported = 0
+
+        def encode(rows, header=False):
+            # Off the event loop: serialising and compressing a chunk is CPU-bound
+            body = encode_export_rows(rows, export_format, columns, header)
+            return compressor.compress(body) if compressor is not None else body
+
+        try:
+            yield await loop.run_in_executor(None, encode, first_rows, export_format == "csv")
+            exported += len(first_rows)
+            async for rows in chunks:
+                yield await loop.run_in_executor(None, encode, rows)
+                exported += len(rows)
+        except Exception as e:
+            print(f"❌ Export aborted after {exported} rows: {e}")
+            raise
+        if compressor is not None:
+            yield compressor.flush()
+
+    headers = {"Content-Disposition": f'attachment; filename="news_export.{export_format}"'}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(stream(), media_type=EXPORT_MEDIA_TYPES[export_format], headers=headers)
 
 @app.get("/api/news/latest")
-async def get_latest_news(limit: int = Query(10, ge=1, le=100, description="Number of latest news items")):
+async def get_latest_news(request: Request, limit: int = Query(10, ge=1, le=100, description="Number of latest news items")):
     """
     Get the latest news items
     
@@ -241,97 +772,190 @@ async def get_latest_news(limit: int = Query(10, ge=1, le=100, description="Numb
     Returns:
         JSON response with latest news data
     """
-    if supabase is None:
-        raise HTTPException(status_code=500, detail="Supabase client not initialized")
+    if storage is None:
+        raise HTTPException(status_code=500, detail="Storage not initialized")
     
-    try:
-        result = supabase.table("news_feed")\
-            .select("*")\
-            .order("scraped_timestamp", desc=True)\
-            .limit(limit)\
-            .execute()
+    async def build_response():
+        try:
+            news_data = await run_db(storage.fetch_page, {}, 0, limit)
         
-        news_data = result.data if result.data else []
+            response_data = {
+                "success": True,
+                "data": news_data,
+                "count": len(news_data),
+                "timestamp": datetime.utcnow().isoformat()
+            }
         
-        response_data = {
-            "success": True,
-            "data": news_data,
-            "count": len(news_data),
-            "timestamp": datetime.utcnow().isoformat()
-        }
+            return response_data
         
-        return JSONResponse(content=response_data)
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error fetching latest news: {str(e)}")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error fetching latest news: {str(e)}")
+
+    return await cached_json_response(request, build_response)
 
 @app.get("/api/stats")
-async def get_news_stats():
+async def get_news_stats(request: Request):
     """
     Get statistics about the news database
     
     Returns:
-        JSON response with database statistics
+        JSON response with the total and article counts by category, source,
+        country, language and publication day
     """
-    if supabase is None:
-        raise HTTPException(status_code=500, detail="Supabase client not initialized")
+    if storage is None:
+        raise HTTPException(status_code=500, detail="Storage not initialized")
     
-    try:
-        # Total count
-        total_result = supabase.table("news_feed").select("id", count="exact").execute()
-        total_count = total_result.count if hasattr(total_result, 'count') else 0
-        
-        # Count by category
-        categories_result = supabase.rpc("get_category_counts").execute()
-        categories = categories_result.data if categories_result.data else []
+    async def build_response():
+        # Counters kept up to date at ingest: one small read, no table scan
+        if await run_db(stats_aggregates.is_built):
+            counts = await run_db(stats_aggregates.counts)
+            return {
+                "success": True,
+                "total_records": counts["total_records"],
+                "categories": counts["category"],
+                "sources": counts["source"],
+                "countries": counts["country"],
+                "languages": counts["language"],
+                "days": counts["day"],
+                "timestamp": datetime.utcnow().isoformat()
+            }
+
+        # Until the counters are built: total count, count by category and
+        # count by source straight from storage, run concurrently
+        total_result, categories, sources = await asyncio.gather(
+            run_db(storage.count),
+            run_db(storage.category_counts),
+            run_db(storage.source_counts),
+            return_exceptions=True
+        )
+        try:
+            if isinstance(total_result, Exception):
+                raise total_result
+            total_count = total_result
         
-        # Count by source
-        sources_result = supabase.rpc("get_source_counts").execute()
-        sources = sources_result.data if sources_result.data else []
+            for result in (categories, sources):
+                if isinstance(result, Exception):
+                    raise result
         
-        response_data = {
-            "success": True,
-            "total_records": total_count,
-            "categories": categories,
-            "sources": sources,
-            "timestamp": datetime.utcnow().isoformat()
-        }
+            response_data = {
+                "success": True,
+                "total_records": total_count,
+                "categories": categories,
+                "sources": sources,
+                "timestamp": datetime.utcnow().isoformat()
+            }
         
-        return JSONResponse(content=response_data)
+            return response_data
         
-    except Exception as e:
-        # Fallback if RPC functions don't exist
-        response_data = {
-            "success": True,
-            "total_records": total_count if 'total_count' in locals() else 0,
-            "note": "Detailed statistics require custom RPC functions in Supabase",
-            "timestamp": datetime.utcnow().isoformat()
-        }
-        return JSONResponse(content=response_data)
+        except Exception as e:
+            # Fallback if RPC functions don't exist
+            response_data = {
+                "success": True,
+                "total_records": total_count if 'total_count' in locals() else 0,
+                "note": "Detailed statistics require python -m utils.stats_aggregates rebuild, or custom RPC functions in Supabase",
+                "timestamp": datetime.utcnow().isoformat()
+            }
+            return response_data
+
+    return await cached_json_response(request, build_response)
+
+@app.get("/api/feeds/health")
+async def get_feed_health():
+    """
+    Get per-feed health recorded by the database scraper
+
+    Returns:
+        JSON response with each feed's failures, latency and circuit breaker
+        state, sorted by time wasted on failed polls
+    """
+    feeds = FeedHealth("supabase").report()
+    response_data = {
+        "success": True,
+        "data": feeds,
+        "open_circuits": sum(1 for feed in feeds if feed["circuit"] == "open"),
+        "total_wasted_seconds": round(sum(feed["wasted_seconds"] for feed in feeds), 2),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+    return JSONResponse(content=response_data)
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """
+    Get response cache counters
+
+    Returns:
+        JSON response with hits, misses, evictions, invalidations and current size,
+        for the response cache and the count cache
+    """
+    return {
+        "success": True,
+        "cache": response_cache.stats(),
+        "count_cache": count_cache.stats(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
 
-@app.post("/update")
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Prometheus metrics for this process
+
+    Returns:
+        Text exposition format with per-route request latency, storage call
+        timings and, once POST /update has run a scrape here, the scraper's
+        per-feed and per-stage metrics
+    """
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+def run_update(on_start=None, on_feed_done=None):
+    # Imported on first use: the scraper builds its own clients at import time,
+    # and later runs reuse its session and caches instead of a fresh interpreter
+    import rss_scraper_db_save as scraper
+    return scraper.run_scrape(on_start=on_start, on_feed_done=on_feed_done)
+
+def clear_read_caches(job):
+    # A failed run may still have upserted some batches
+    response_cache.invalidate()
+    count_cache.invalidate()
+
+update_jobs = UpdateJobRunner(run_update, on_finished=clear_read_caches)
+
+@app.post("/update", status_code=202)
 async def update_data():
     """
-    Run rss_scraper_db_save.py once when this endpoint is hit
+    Start a scrape in the background, or join the one already running
+
+    Returns:
+        JSON response with the job id to poll at GET /update/{job_id}
     """
-    try:
-        result = subprocess.run(
-            ["python", "rss_scraper_db_save.py"],
-            cwd=os.path.dirname(__file__),
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        return {
-            "success": True,
-            "message": "Script executed successfully",
-            "output": result.stdout
-        }
-    except subprocess.CalledProcessError as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Script execution failed: {e.stderr}"
-        )
+    job, created = update_jobs.submit()
+    return {
+        "success": True,
+        "message": "Update started" if created else "Update already in progress, joined the running job",
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "status_url": f"/update/{job['job_id']}"
+    }
+
+@app.get("/update/{job_id}")
+async def get_update_status(job_id: str):
+    """
+    Get the progress of an update job
+
+    Args:
+        job_id: Job id returned by POST /update
+
+    Returns:
+        JSON response with the job's status, stage, per-feed new articles and
+        timings, and the upsert summary once finished
+    """
+    job = update_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired update job")
+    return {
+        "success": True,
+        "job": job,
+        "timestamp": datetime.utcnow().isoformat()
+    }
 
 if __name__ == "__main__":
     import uvicorn
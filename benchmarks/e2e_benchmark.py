@@ -0,0 +1,338 @@
+"""
+Run the database scraper and the API end to end, offline, and time each stage
+
+Every feed fixture from benchmarks/feed_fixtures.py (the registry's sources
+rebuilt from the scraped CSV as RSS and Atom, plus a Google News feed per
+historical CSV) is served from a local HTTP server that can add latency and
+answer a share of requests with an error. The scraper runs unchanged against
+it with STORAGE_BACKEND=sqlite and every cache, index and database in a
+temporary directory, with its fetch, parse, clean_html and write calls timed
+as they happen; post-processing is what is left of each feed's time. The API
+is then queried in-process over the same database, once with the response
+cache cleared before every request and once warm.
+
+Stage throughput is items per busy second summed over the fetch threads, so
+it stays comparable whatever --workers is. --json saves the results and
+--baseline compares against saved ones, exiting 1 when a stage got slower
+by more than --tolerance.
+
+Run from the repository root:
+    python benchmarks/e2e_benchmark.py [--latency-ms 50] [--error-rate 0.05] [--json results.json]
+"""
+import argparse
+import collections
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, ".")
+from benchmarks.feed_fixtures import build_fixtures, load_scraped_rows, slugify  # noqa: E402
+
+STAGES = ("fetch", "parse", "clean_html", "post-process", "write")
+
+
+# -------------------------- FEED SERVER --------------------------
+class FeedServer(ThreadingHTTPServer):
+    """Serves fixtures at /<name> after latency_ms (+ up to jitter_ms), failing error_rate of requests"""
+
+    daemon_threads = True
+
+    def __init__(self, fixtures, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, error_status=503, seed=7):
+        super().__init__(("127.0.0.1", 0), FeedRequestHandler)
+        self.fixtures = fixtures
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.served = collections.Counter()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def url_for(self, name):
+        return f"http://127.0.0.1:{self.server_address[1]}/{name}"
+
+    def next_response(self):
+        # (delay in seconds, whether to fail), drawn under a lock so a seed replays the same run
+        with self._lock:
+            delay = (self.latency_ms + self._rng.uniform(0, self.jitter_ms)) / 1000
+            return delay, self._rng.random() < self.error_rate
+
+
+class FeedRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        body = server.fixtures.get(self.path.lstrip("/"))
+        delay, fail = server.next_response()
+        if delay:
+            time.sleep(delay)
+        if body is None or fail:
+            status = 404 if body is None else server.error_status
+            with server._lock:
+                server.served[status] += 1
+            self.send_error(status)
+            return
+        with server._lock:
+            server.served[200] += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "application/xml; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def write_registry(server, path):
+    """
+    Feed registry pointing every fixture at the local server
+
+    Scraped sources keep the country and language the CSV recorded for them;
+    Google News feeds take their country from the fixture name.
+    """
+    scraped = load_scraped_rows().drop_duplicates("Source").set_index("Source")
+    origins = {slugify(source): (row["Country"], row["Language"]) for source, row in scraped.iterrows()}
+    entries = []
+    for name in server.fixtures:
+        kind, _, slug = name.partition("-")
+        country, language = (slug, "en") if kind == "googlenews" else origins[slug]
+        entries.append({"url": server.url_for(name), "country": country or None, "language": language or None})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(entries, f)
+
+
+# -------------------------- STAGE TIMING --------------------------
+class StageTimer:
+    """Busy seconds and item counts per stage, accumulated from any thread"""
+
+    def __init__(self):
+        self.seconds = collections.Counter()
+        self.items = collections.Counter()
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def add(self, stage, seconds, items=1):
+        with self._lock:
+            self.seconds[stage] += seconds
+            self.items[stage] += items
+        # Feed-level stage time of the current call, for post-processing
+        self._local.inner = getattr(self._local, "inner", 0.0) + seconds
+
+    def wrap(self, stage, fn, count=lambda result, args: 1):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            result = fn(*args, **kwargs)
+            self.add(stage, time.perf_counter() - started, count(result, args))
+            return result
+        return timed
+
+    def wrap_feed(self, fn):
+        # Whatever a feed's fetch_news call spends outside the timed stages is post-processing
+        def timed(url, *args):
+            self._local.inner = 0.0
+            started = time.perf_counter()
+            articles = fn(url, *args)
+            elapsed = time.perf_counter() - started - self._local.inner
+            with self._lock:
+                self.seconds["post-process"] += elapsed
+                self.items["post-process"] += len(articles)
+            return articles
+        return timed
+
+
+def instrument(scraper, timer):
+    """Swap the scraper's stage functions for timed ones; the scraper resolves them at call time"""
+    session_get = scraper.session.get
+
+    def fetch(*args, **kwargs):
+        started = time.perf_counter()
+        response = session_get(*args, **kwargs)
+        timer.add("fetch", time.perf_counter() - started)
+        with timer._lock:
+            timer.bytes += len(response.content)
+        return response
+
+    scraper.session.get = fetch
+    scraper.parse_feed = timer.wrap("parse", scraper.parse_feed, lambda feed, args: len(feed.entries))
+    scraper.clean_html = timer.wrap("clean_html", scraper.clean_html)
+    scraper.fetch_news = timer.wrap_feed(scraper.fetch_news)
+    scraper.upsert_articles = timer.wrap("write", scraper.upsert_articles, lambda stats, args: len(args[0]))
+
+
+# -------------------------- API LATENCY --------------------------
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def api_requests(client, rows):
+    """Endpoints to time, with filters and search terms taken from the scraped data"""
+    country = collections.Counter(row["country"] for row in rows).most_common(1)[0][0]
+    source = collections.Counter(row["source"] for row in rows if row["source"]).most_common(1)[0][0]
+    words = collections.Counter(
+        word for row in rows for word in (row["title"] or "").lower().split() if len(word) >= 6 and word.isalpha()
+    )
+    cursor = client.get("/api/news", params={"limit": 100}).json()["pagination"]["next_cursor"]
+    requests = {
+        "news page 1": ("/api/news/1", {}),
+        "news page 20": ("/api/news/20", {}),
+        "news cursor": ("/api/news", {"limit": 100, "cursor": cursor}),
+        "news collapsed": ("/api/news", {"limit": 100, "collapse": "true"}),
+        "search country": ("/api/news/search", {"country": country}),
+        "search source": ("/api/news/search", {"source": source, "total": "none"}),
+        "search q": ("/api/news/search", {"q": words.most_common(1)[0][0]}),
+        "search q phrase": ("/api/news/search", {"q": " ".join(word for word, _ in words.most_common(3)[1:])}),
+        "latest": ("/api/news/latest", {"limit": 50}),
+        "export country": ("/api/news/export", {"country": country, "fields": "title,news_url,scraped_timestamp"}),
+        "stats": ("/api/stats", {}),
+    }
+    if cursor is None:
+        del requests["news cursor"]
+    return requests
+
+
+def time_api(api, client, requests, count):
+    """{name: {cold/warm p50/p99 in ms}}; cold clears the response and count caches before each request"""
+    results = {}
+    for name, (path, params) in requests.items():
+        samples = {"cold": [], "warm": []}
+        for mode in ("cold", "warm"):
+            for _ in range(count):
+                if mode == "cold":
+                    api.response_cache.invalidate()
+                    api.count_cache.invalidate()
+                started = time.perf_counter()
+                response = client.get(path, params=params)
+                samples[mode].append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    raise RuntimeError(f"{path} {params} answered {response.status_code}: {response.text[:200]}")
+        results[name] = {
+            f"{mode} {label}": percentile(values, fraction)
+            for mode, values in samples.items() for label, fraction in (("p50", 0.5), ("p99", 0.99))
+        }
+    return results
+
+
+# -------------------------- REPORTING --------------------------
+def compare(results, baseline, tolerance):
+    """Stages and endpoints more than tolerance slower than in baseline"""
+    regressions = []
+    for stage, values in baseline.get("stages", {}).items():
+        now = results["stages"].get(stage, {}).get("items_per_second")
+        if now is not None and values["items_per_second"] and now < values["items_per_second"] * (1 - tolerance):
+            regressions.append(f"{stage}: {now:.0f}/s vs {values['items_per_second']:.0f}/s")
+    for name, values in baseline.get("api", {}).items():
+        for key, before in values.items():
+            now = results["api"].get(name, {}).get(key)
+            if now is not None and now > before * (1 + tolerance):
+                regressions.append(f"{name} {key}: {now:.2f}ms vs {before:.2f}ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay before every feed response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="extra random delay of up to this much")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of feed requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--workers", type=int, default=16, help="feed fetch threads (FEED_FETCH_WORKERS)")
+    parser.add_argument("--api-requests", type=int, default=50, help="requests per endpoint, cold and warm each")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results file from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against --baseline")
+    args = parser.parse_args()
+
+    fixtures = build_fixtures()
+    server = FeedServer(fixtures, args.latency_ms, args.jitter_ms, args.error_rate, args.error_status, args.seed)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Module-level config is read at import, so the environment is set first.
+        # Every fixture is on one local host, which the per-host cap would serialise
+        os.environ.update({
+            "STORAGE_BACKEND": "sqlite",
+            "SQLITE_DB_PATH": os.path.join(tmp, "news_feed.sqlite3"),
+            "FEED_CACHE_DIR": os.path.join(tmp, "cache"),
+            "FEED_FETCH_WORKERS": str(args.workers),
+            "FEED_FETCH_PER_HOST": str(args.workers),
+        })
+        for name in ("SEARCH_INDEX_PATH", "AGGREGATES_PATH", "NEAR_DUPLICATE_INDEX_PATH"):
+            os.environ.pop(name, None)
+        import rss_scraper_db_save as scraper
+        from utils.feed_registry import load_feed_registry
+
+        registry_path = os.path.join(tmp, "feed_registry.json")
+        write_registry(server, registry_path)
+        scraper.feeds = load_feed_registry(registry_path)
+        timer = StageTimer()
+        instrument(scraper, timer)
+
+        print(f"🧪 {len(fixtures)} fixture feeds ({sum(len(body) for body in fixtures.values()) / 1e6:.1f} MB), "
+              f"{args.latency_ms:g}ms latency (+{args.jitter_ms:g}), {args.error_rate:.0%} errors, {args.workers} workers")
+        started = time.perf_counter()
+        scrape = scraper.run_scrape(list(scraper.feeds))
+        wall = time.perf_counter() - started
+
+        from fastapi.testclient import TestClient
+        import api
+
+        client = TestClient(api.app)
+        rows = api.storage.rows_after_id(0, 100000, ("country", "source", "title"))
+        api_results = time_api(api, client, api_requests(client, rows), args.api_requests)
+        server.shutdown()
+
+    results = {
+        "config": vars(args),
+        "scrape": {
+            "feeds": len(fixtures), "articles": len(rows), "wall_seconds": wall, "bytes": timer.bytes,
+            "upsert": scrape["upsert"], "responses": {str(status): count for status, count in server.served.items()},
+        },
+        "stages": {
+            stage: {
+                "items": timer.items[stage], "seconds": timer.seconds[stage],
+                "items_per_second": timer.items[stage] / timer.seconds[stage] if timer.seconds[stage] else None,
+            }
+            for stage in STAGES
+        },
+        "api": api_results,
+    }
+
+    print(f"\n📥 Scraped {len(rows)} articles from {len(fixtures)} feeds in {wall:.2f}s "
+          f"({len(rows) / wall:.0f} articles/s, responses {dict(server.served)})")
+    units = {"fetch": "feeds", "parse": "entries", "clean_html": "summaries", "post-process": "articles", "write": "rows"}
+    print(f"{'stage':<14} {'items':>8} {'busy s':>8} {'items/s':>10}")
+    for stage in STAGES:
+        values = results["stages"][stage]
+        rate = f"{values['items_per_second']:.0f}" if values["items_per_second"] else "-"
+        print(f"{stage:<14} {values['items']:>8} {values['seconds']:>8.3f} {rate:>10}   {units[stage]}")
+    print(f"{'':<14} fetched {timer.bytes / 1e6:.1f} MB, "
+          f"{timer.bytes / 1e6 / timer.seconds['fetch'] if timer.seconds['fetch'] else 0:.1f} MB per busy second")
+
+    print(f"\n{'endpoint':<18} {'cold p50':>9} {'cold p99':>9} {'warm p50':>9} {'warm p99':>9}   (ms)")
+    for name, values in api_results.items():
+        print(f"{name:<18} {values['cold p50']:>9.2f} {values['cold p99']:>9.2f} {values['warm p50']:>9.2f} {values['warm p99']:>9.2f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {args.json}")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regressions beyond {args.tolerance:.0%}:")
+            for regression in regressions:
+                print(f"   {regression}")
+            sys.exit(1)
+        print(f"\n✅ Within {args.tolerance:.0%} of {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Recorded-feed stand-ins built from the CSV corpora in this repository
+
+The scraped CSVs are rebuilt into the RSS 2.0 and Atom documents the
+publishers serve (one feed per source) and the historical CSVs into Google
+News search feeds (one per country), so parsers and scrapers can be
+exercised offline on realistic content.
+"""
+import glob
+import os
+import re
+from xml.sax.saxutils import escape, quoteattr
+
+import pandas as pd
+
+SCRAPED_CSV = "rss_scraped_data/csv/rss_scraped_data_output.csv"
+HISTORICAL_CSV_GLOB = "historical_data/csv/historical_data_*.csv"
+
+NAMESPACES = (
+    'xmlns:dc="http://purl.org/dc/elements/1.1/" '
+    'xmlns:media="http://search.yahoo.com/mrss/" '
+    'xmlns:content="http://purl.org/rss/1.0/modules/content/"'
+)
+
+
+def slugify(text):
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")[:40] or "feed"
+
+
+def load_scraped_rows():
+    """Scraped CSV rows with the "<field> Not Found" sentinels turned back into blanks"""
+    df = pd.read_csv(SCRAPED_CSV, dtype=str, keep_default_na=False)
+    for column in df.columns:
+        df.loc[df[column].str.endswith(" Not Found"), column] = ""
+    return df
+
+
+def _description(summary, index):
+    html_summary = f"<p>{escape(summary)}</p>"
+    if index % 2 == 0 and "]]>" not in html_summary:
+        return f"<![CDATA[{html_summary}]]>"
+    return escape(html_summary)
+
+
+def _media(image_url, index):
+    if not image_url:
+        return ""
+    if index % 2 == 0:
+        return f'<media:thumbnail url={quoteattr(image_url)} width="240" height="135"/>'
+    return f'<media:content url={quoteattr(image_url)} medium="image"/>'
+
+
+def build_rss(source, language, rows):
+    items = []
+    for index, row in enumerate(rows):
+        parts = [f"<title>{escape(row['Title'])}</title>"]
+        if row["News URL"]:
+            parts.append(f"<link>{escape(row['News URL'])}</link>")
+        if row["GUID"]:
+            parts.append(f'<guid isPermaLink="false">{escape(row["GUID"])}</guid>')
+        if row["Publication Date"]:
+            parts.append(f"<pubDate>{escape(row['Publication Date'])}</pubDate>")
+        if row["Author"]:
+            tag = "author" if "@" in row["Author"] else "dc:creator"
+            parts.append(f"<{tag}>{escape(row['Author'])}</{tag}>")
+        for term in filter(None, (term.strip() for term in row["Category"].split(","))):
+            parts.append(f"<category>{escape(term)}</category>")
+        if row["Summary"]:
+            parts.append(f"<description>{_description(row['Summary'], index)}</description>")
+        parts.append(_media(row["Image URL"], index))
+        items.append("<item>" + "".join(parts) + "</item>")
+
+    language_tag = f"<language>{escape(language)}</language>" if language else ""
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>\n<rss version="2.0" {NAMESPACES}><channel>'
+        f"<title>{escape(source)}</title><link>https://example.com/</link>{language_tag}"
+        + "\n".join(items)
+        + "</channel></rss>"
+    ).encode("utf-8")
+
+
+def build_atom(source, language, rows):
+    entries = []
+    for index, row in enumerate(rows):
+        parts = [f"<title>{escape(row['Title'])}</title>"]
+        if row["News URL"]:
+            parts.append(f'<link rel="alternate" href={quoteattr(row["News URL"])}/>')
+        parts.append(f"<id>{escape(row['GUID'] or row['News URL'])}</id>")
+        if row["Publication Date"]:
+            parts.append(f"<published>{escape(row['Publication Date'])}</published>")
+        if row["Author"]:
+            parts.append(f"<author><name>{escape(row['Author'])}</name></author>")
+        for term in filter(None, (term.strip() for term in row["Category"].split(","))):
+            parts.append(f"<category term={quoteattr(term)}/>")
+        if row["Summary"]:
+            parts.append(f'<summary type="html">{escape("<p>" + escape(row["Summary"]) + "</p>")}</summary>')
+        parts.append(_media(row["Image URL"], index))
+        entries.append("<entry>" + "".join(parts) + "</entry>")
+
+    lang_attr = f" xml:lang={quoteattr(language)}" if language else ""
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>\n<feed xmlns="http://www.w3.org/2005/Atom" '
+        f'xmlns:media="http://search.yahoo.com/mrss/"{lang_attr}>'
+        f"<title>{escape(source)}</title><id>urn:feed:{slugify(source)}</id>"
+        + "\n".join(entries)
+        + "</feed>"
+    ).encode("utf-8")
+
+
+def build_google_news_rss(query, df):
+    items = []
+    for row in df.to_dict("records"):
+        title = row["Title"]
+        summary = (
+            f'<a href="{escape(row["Link"])}" target="_blank">{escape(title)}</a>'
+            f'&nbsp;&nbsp;<font color="#6f6f6f">{escape(row["Source"])}</font>'
+        )
+        items.append(
+            f"<item><title>{escape(title)}</title><link>{escape(row['Link'])}</link>"
+            f'<guid isPermaLink="false">{escape(row["Link"])}</guid>'
+            f"<pubDate>{escape(row['Published'])}</pubDate>"
+            f"<description>{escape(summary)}</description>"
+            f'<source url="https://{escape(row["Publisher Domain"])}">{escape(row["Source"])}</source></item>'
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n<rss version="2.0"><channel>'
+        f'<title>"{escape(query)}" - Google News</title><language>en-IN</language>'
+        + "\n".join(items)
+        + "</channel></rss>"
+    ).encode("utf-8")
+
+
+def build_fixtures():
+    """
+    Returns:
+        Dict of fixture name -> feed document bytes, one RSS and one Atom
+        rendering per scraped source plus a Google News feed per country
+    """
+    fixtures = {}
+    df = load_scraped_rows()
+    for source, group in df.groupby("Source", sort=True):
+        rows = group.to_dict("records")
+        language = group["Language"].iloc[0]
+        fixtures[f"rss-{slugify(source)}"] = build_rss(source, language, rows)
+        fixtures[f"atom-{slugify(source)}"] = build_atom(source, language, rows)
+
+    for path in sorted(glob.glob(HISTORICAL_CSV_GLOB)):
+        country = os.path.basename(path)[len("historical_data_"):-len(".csv")]
+        history = pd.read_csv(path, dtype=str, keep_default_na=False)
+        fixtures[f"googlenews-{country}"] = build_google_news_rss(country, history)
+    return fixtures
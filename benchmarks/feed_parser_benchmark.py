@@ -0,0 +1,136 @@
+"""
+Compare utils.feed_parser's lxml fast path against feedparser
+
+For every feed document it checks that both parsers yield the same values for
+the fields fetch_news stores, then times each parser over the whole set.
+By default the documents are the stand-ins rebuilt from our CSV corpora
+(benchmarks/feed_fixtures.py); pass a directory to use recorded feed bodies
+instead, e.g. ones saved from the feeds in utils/feed_registry.json.
+A few hand-written edge cases (permalink guids standing in for links) are
+always checked as well.
+
+Run from the repository root:
+    python benchmarks/feed_parser_benchmark.py [recorded_feeds_dir] [--repeat N]
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+import tracemalloc
+
+import feedparser
+
+sys.path.insert(0, ".")
+from benchmarks.feed_fixtures import build_fixtures  # noqa: E402
+from utils.feed_parser import UnsupportedFeed, parse_feed_fast  # noqa: E402
+from utils.html_cleaner import clean_html  # noqa: E402
+
+
+def stored_fields(parsed):
+    """The values fetch_news and historical_data.py derive from a parsed feed, one tuple per entry"""
+    rows = []
+    for entry in parsed.entries:
+        tags = entry.get("tags") or []
+        images = entry.get("media_thumbnail") or entry.get("media_content") or [{}]
+        rows.append((
+            entry.get("title", "").strip(),
+            entry.get("link", "").strip(),
+            entry.get("id", entry.get("guid", "")).strip(),
+            entry.get("published", "").strip(),
+            entry.get("author", "").strip(),
+            clean_html(entry.get("summary", "")),
+            ", ".join(tag.get("term", "").strip() for tag in tags if tag.get("term", "").strip()),
+            images[0].get("url", ""),
+            (entry.get("source") or {}).get("title", ""),
+            (entry.get("source") or {}).get("href", ""),
+        ))
+    return parsed.feed.get("title", "").strip(), parsed.feed.get("language", "").strip(), rows
+
+
+def _rss_document(items):
+    return f'<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel><title>Edge cases</title>{items}</channel></rss>'.encode("utf-8")
+
+
+# Shapes the CSV stand-ins never produce, checked on every run
+EDGE_CASES = {
+    "edge-guid-permalink": _rss_document(
+        '<item><title>Permalink guid, no link</title><guid>http://x/1</guid></item>'
+        '<item><title>Explicit permalink</title><guid isPermaLink="true">http://x/2</guid></item>'
+        '<item><title>Non-URL guid</title><guid>abc-3</guid></item>'
+    ),
+    "edge-guid-not-permalink": _rss_document(
+        '<item><title>Not a permalink</title><guid isPermaLink="false">http://x/4</guid></item>'
+        '<item><title>Not "true"</title><guid isPermaLink="True">http://x/5</guid></item>'
+    ),
+    "edge-guid-and-link": _rss_document(
+        '<item><title>Guid first</title><guid>http://x/6</guid><link>http://y/6</link></item>'
+        '<item><title>Link first</title><link>http://y/7</link><guid>http://x/7</guid></item>'
+    ),
+}
+
+
+def load_documents(directory):
+    if directory is None:
+        documents = build_fixtures()
+    else:
+        documents = {
+            os.path.basename(path): open(path, "rb").read()
+            for path in sorted(glob.glob(os.path.join(directory, "*")))
+            if os.path.isfile(path)
+        }
+    return {**documents, **EDGE_CASES}
+
+
+def time_parser(parse, documents, repeat):
+    tracemalloc.start()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for content in documents:
+            parse(content)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("directory", nargs="?", help="directory of recorded feed bodies")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    documents = load_documents(args.directory)
+    fast_documents = []
+    mismatches = 0
+    entries = 0
+    for name, content in documents.items():
+        try:
+            fast = stored_fields(parse_feed_fast(content))
+        except UnsupportedFeed as e:
+            print(f"↩️ {name}: falls back to feedparser ({e})")
+            continue
+        fast_documents.append(content)
+        reference = stored_fields(feedparser.parse(content))
+        entries += len(reference[2])
+        if fast != reference:
+            mismatches += 1
+            print(f"❌ {name}: fast path differs from feedparser")
+            for fast_row, reference_row in zip(fast[2], reference[2]):
+                if fast_row != reference_row:
+                    print(f"   fast: {fast_row}\n   ref:  {reference_row}")
+                    break
+
+    print(f"📚 {len(fast_documents)}/{len(documents)} feeds ({entries} entries) on the fast path")
+    fast_seconds, fast_peak = time_parser(parse_feed_fast, fast_documents, args.repeat)
+    reference_seconds, reference_peak = time_parser(feedparser.parse, fast_documents, args.repeat)
+    print(f"⏱️ lxml fast path: {fast_seconds:.2f}s, peak {fast_peak / 1e6:.1f} MB")
+    print(f"⏱️ feedparser:     {reference_seconds:.2f}s, peak {reference_peak / 1e6:.1f} MB")
+    print(f"🚀 {reference_seconds / fast_seconds:.1f}x faster over {args.repeat} passes")
+
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
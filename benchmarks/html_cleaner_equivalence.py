@@ -0,0 +1,86 @@
+"""
+Check utils.html_cleaner.clean_html against BeautifulSoup on a corpus built
+from the scraped CSVs, and time both
+
+The CSVs only hold already-cleaned text, so every row is rebuilt into the
+HTML shapes our feeds actually send: plain text, escaped text in a <p>,
+Google News' <a>&nbsp;&nbsp;<font> summary and an image-plus-paragraph card.
+EDGE_CASES adds hand-written entity inputs the CSVs don't cover.
+
+Run from the repository root:
+    python benchmarks/html_cleaner_equivalence.py
+"""
+import glob
+import html
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, ".")
+from utils.html_cleaner import clean_html, soup_text  # noqa: E402
+
+# Both call styles used in the repo: the scrapers' and historical_data.py's
+MODES = [
+    {"separator": " ", "strip": True},
+    {"separator": "", "strip": False},
+]
+
+# Entities without a ";" or unknown to html5, which BeautifulSoup treats
+# differently from html.unescape
+EDGE_CASES = [
+    "&nbsp", "x&ampy", "a &amp b", "&lt;b&gt", "&copy2024", "&AMP", "AT&T", "Q&A: <b>rates</b>",
+    "&foo;", "<p>&notit; here</p>", "&nbsp;&nbsp;<font>ok</font>", "&#39;quoted&#x27;", "x&y;",
+]
+
+
+def build_corpus():
+    corpus = []
+    df = pd.read_csv("rss_scraped_data/csv/rss_scraped_data_output.csv", dtype=str, keep_default_na=False)
+    for title, summary, image in df[["Title", "Summary", "Image URL"]].itertuples(index=False, name=None):
+        corpus.append(summary)
+        corpus.append(f"<p>{html.escape(summary, quote=False)}</p>")
+        corpus.append(f'<img src="{html.escape(image)}" alt="" /><p>{html.escape(title)}</p>\n<p>{html.escape(summary)}</p>')
+
+    for path in sorted(glob.glob("historical_data/csv/historical_data_*.csv")):
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        for row in df.itertuples(index=False):
+            corpus.append(
+                f'<a href="{html.escape(row.Link)}" target="_blank">{html.escape(row.Title)}</a>'
+                f'&nbsp;&nbsp;<font color="#6f6f6f">{html.escape(row.Source)}</font>'
+            )
+    return corpus + EDGE_CASES
+
+
+def time_cleaner(cleaner, corpus, mode):
+    started = time.perf_counter()
+    for raw_html in corpus:
+        cleaner(raw_html, **mode)
+    return time.perf_counter() - started
+
+
+def main():
+    corpus = build_corpus()
+    print(f"📚 Corpus: {len(corpus)} summaries")
+
+    mismatches = 0
+    for mode in MODES:
+        for raw_html in corpus:
+            fast, reference = clean_html(raw_html, **mode), soup_text(raw_html, **mode)
+            if fast != reference:
+                mismatches += 1
+                if mismatches <= 10:
+                    print(f"❌ Mismatch {mode}: {raw_html[:80]!r}\n   fast: {fast[:80]!r}\n   soup: {reference[:80]!r}")
+
+        fast_seconds = time_cleaner(clean_html, corpus, mode)
+        soup_seconds = time_cleaner(soup_text, corpus, mode)
+        print(f"⏱️ {mode}: clean_html {fast_seconds:.3f}s, BeautifulSoup {soup_seconds:.3f}s ({soup_seconds / fast_seconds:.1f}x faster)")
+
+    if mismatches:
+        print(f"❌ {mismatches} mismatches")
+        sys.exit(1)
+    print("✅ clean_html matches BeautifulSoup on the whole corpus")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Time utils.search_index's ranked full-text search against an unindexed
+substring scan (what search_title's ilike does) as the corpus grows
+
+The base corpus is every article in the scraped and historical CSVs. Larger
+corpora append copies whose words all carry a copy-specific prefix, so each
+copy has the same shape as real news but talks about "new" things: a query
+taken from the base corpus matches the same articles at every size, the way
+a search for a story keeps matching that story while the table fills up with
+later ones. The scan has to read every row regardless; the index should not.
+
+Run from the repository root:
+    python benchmarks/search_benchmark.py [--scales 1,4,16,32] [--queries 200]
+"""
+import argparse
+import glob
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+sys.path.insert(0, ".")
+from benchmarks.feed_fixtures import load_scraped_rows  # noqa: E402
+from utils.search_index import SearchIndex  # noqa: E402
+
+WORD = re.compile(r"\w+")
+
+
+def load_base_articles():
+    articles = []
+    scraped = load_scraped_rows()
+    for title, summary, category, country, scraped_at in scraped[["Title", "Summary", "Category", "Country", "Scraped Timestamp"]].itertuples(index=False, name=None):
+        articles.append({"title": title, "summary": summary, "category": category, "country": country, "scraped_timestamp": scraped_at})
+    for path in sorted(glob.glob("historical_data/csv/historical_data_*.csv")):
+        country = os.path.basename(path)[len("historical_data_"):-len(".csv")]
+        df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        for title, summary, scraped_at in df[["Title", "Summary", "Scraped Time"]].itertuples(index=False, name=None):
+            articles.append({"title": title, "summary": summary, "category": "", "country": country, "scraped_timestamp": scraped_at})
+    return articles
+
+
+def copy_prefix(copy_number):
+    """Prefix that no real word starts with, so copies never share a word, or a word prefix, with the base"""
+    return f"zz{copy_number}q" if copy_number else ""
+
+
+def shifted(text, prefix):
+    return WORD.sub(lambda match: prefix + match.group(0), text) if prefix else text
+
+
+def build_corpus(base, scale):
+    for copy_number in range(scale):
+        prefix = copy_prefix(copy_number)
+        for index, article in enumerate(base):
+            yield {
+                **article,
+                "guid": f"{copy_number}-{index}",
+                "title": shifted(article["title"], prefix),
+                "summary": shifted(article["summary"], prefix),
+                "category": shifted(article["category"], prefix),
+            }
+
+
+def pick_queries(base, count, seed=7):
+    """One or two prefixes of title words per query, skipping short words that are mostly stopwords"""
+    rng = random.Random(seed)
+    words = [word for article in base for word in WORD.findall(article["title"]) if len(word) >= 5 and not word.isdigit()]
+    queries = []
+    for _ in range(count):
+        terms = rng.sample(words, rng.choice((1, 1, 2)))
+        queries.append(" ".join(term[:rng.randint(4, len(term))] for term in terms))
+    return queries
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def time_queries(run_query, queries):
+    samples = []
+    for query in queries:
+        started = time.perf_counter()
+        run_query(query)
+        samples.append((time.perf_counter() - started) * 1000)
+    return percentile(samples, 0.5), percentile(samples, 0.99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scales", default="1,4,16,32", help="corpus sizes as multiples of the CSV corpus")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    base = load_base_articles()
+    queries = pick_queries(base, args.queries)
+    print(f"📚 Base corpus: {len(base)} articles, {len(queries)} queries, top {args.limit}")
+    print(f"{'articles':>10} {'fts p50':>9} {'fts p99':>9} {'scan p50':>9} {'scan p99':>9}   (ms)")
+
+    for scale in [int(value) for value in args.scales.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            index = SearchIndex(os.path.join(tmp, "search_index.sqlite3"))
+            corpus = list(build_corpus(base, scale))
+            for start in range(0, len(corpus), 5000):
+                index.add(corpus[start:start + 5000])
+            index.optimize()
+            conn = index._conn
+
+            def fts(query):
+                return index.search(query, limit=args.limit, count=False)
+
+            def scan(query):
+                # search_title's ilike('%term%'), extended to the same three columns
+                pattern = f"%{query}%"
+                return conn.execute(
+                    "SELECT guid FROM search_articles WHERE title LIKE ? OR summary LIKE ? OR category LIKE ? "
+                    "ORDER BY scraped_timestamp DESC LIMIT ?",
+                    (pattern, pattern, pattern, args.limit)
+                ).fetchall()
+
+            fts_p50, fts_p99 = time_queries(fts, queries)
+            scan_p50, scan_p99 = time_queries(scan, queries)
+            index.close()
+        print(f"{len(corpus):>10} {fts_p50:>9.2f} {fts_p99:>9.2f} {scan_p50:>9.2f} {scan_p99:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
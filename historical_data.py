@@ -1,11 +1,21 @@
-from datetime import datetime, timedelta
-import feedparser
+from datetime import date, datetime, timedelta
+import argparse
+import json
 import pandas as pd
-from bs4 import BeautifulSoup
+import pyarrow.dataset as ds
+import requests
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
 from urllib.parse import urlparse, quote_plus
-from textblob import TextBlob
 import time
 import os
+from utils.html_cleaner import clean_html
+from utils.feed_parser import parse_feed
+from utils.near_duplicates import canonical_url
+from utils.rate_limiter import AdaptiveRateLimiter, retry_after_seconds
+from utils.backfill_checkpoints import BackfillCheckpoint
+from utils.sentiment import SentimentCache, score_texts
+from utils import parquet_store
 
 # Country-specific search queries
 countries = {
@@ -15,6 +25,31 @@ countries = {
     "singapore": "Singapore"
 }
 
+# -------------------------- FETCH CONFIG --------------------------
+# Every (country, window) search runs on a shared pool; the token bucket, not
+# the pool size, decides how fast requests go out across all of them
+HISTORICAL_WORKERS = int(os.getenv("HISTORICAL_WORKERS", "8"))
+REQUESTS_PER_SECOND = float(os.getenv("HISTORICAL_REQUESTS_PER_SECOND", "1"))
+MAX_ATTEMPTS = 5
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+session = requests.Session()
+adapter = HTTPAdapter(pool_connections=HISTORICAL_WORKERS, pool_maxsize=HISTORICAL_WORKERS)
+session.mount("http://", adapter)
+session.mount("https://", adapter)
+session.headers.update({
+    'User-Agent': 'Mozilla/5.0'
+})
+
+# -------------------------- WINDOWING --------------------------
+# Google News search returns at most ~100 results per query, so a window that
+# comes back at the cap is split in half until its halves fit (down to one day)
+RESULT_CAP = int(os.getenv("GOOGLE_NEWS_RESULT_CAP", "100"))
+# Adjacent windows that together found less than this share of the cap are
+# fetched as one window on the next run
+SPARSE_FRACTION = 0.8
+COVERAGE_PATH = "historical_data/window_coverage.json"
+
 # Date range for 1 year
 end_date = datetime.utcnow()
 start_date = end_date - timedelta(days=365)
@@ -28,63 +63,282 @@ def generate_date_ranges(start, end, delta=30):
         start = chunk_end
     return ranges
 
-# Fetch articles for a given country
-def fetch_articles_for_country(country_name, query):
-    date_ranges = generate_date_ranges(start_date, end_date)
-    all_articles = []
-
-    for start, end in date_ranges:
-        time.sleep(1)  # Avoid rate limiting
-        print(f"🔍 Fetching: {query} after:{start.date()} before:{end.date()}")
-        encoded_query = quote_plus(f"{query} after:{start.date()} before:{end.date()}")
-        feed_url = (
-            f"https://news.google.com/rss/search?q={encoded_query}&hl=en-IN&gl=IN&ceid=IN:en"
-        )
+# Halve a window on a day boundary; None once it is a single day
+def split_window(start, end):
+    days = (end - start).days
+    if days < 2:
+        return None
+    middle = start + timedelta(days=days // 2)
+    return [(start, middle), (middle, end)]
+
+def load_coverage(path=COVERAGE_PATH):
+    """Per-country window coverage written by the last run, or {}"""
+    try:
+        with open(path) as f:
+            return json.load(f).get("countries", {})
+    except (OSError, ValueError):
+        return {}
+
+def save_coverage(coverage, path=COVERAGE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"result_cap": RESULT_CAP, "updated_at": datetime.utcnow().isoformat(), "countries": coverage}, f, indent=2)
+
+def plan_windows(start, end, previous=None):
+    """
+    Windows to request first for one country
+
+    Reuses the leaf windows the last run settled on, so windows it had to split
+    start out split, and fills any days it didn't cover with 30-day chunks.
+    Adjacent windows whose combined article count stayed well under the cap
+    are merged back into one request.
+
+    Args:
+        start: First day (date) to cover
+        end: Day (date) to stop before
+        previous: This country's entries from load_coverage(), if any
+
+    Returns:
+        Sorted list of (start, end) date pairs covering [start, end)
+    """
+    known = []
+    for leaf in previous or []:
+        leaf_start = max(start, datetime.strptime(leaf["start"], "%Y-%m-%d").date())
+        leaf_end = min(end, datetime.strptime(leaf["end"], "%Y-%m-%d").date())
+        if leaf_start < leaf_end:
+            known.append((leaf_start, leaf_end, leaf.get("articles")))
+
+    windows = []
+    cursor = start
+    for leaf_start, leaf_end, articles in sorted(known):
+        if leaf_end <= cursor:
+            continue
+        if leaf_start > cursor:
+            windows.extend((s, e, None) for s, e in generate_date_ranges(cursor, leaf_start))
+        windows.append((max(leaf_start, cursor), leaf_end, articles))
+        cursor = leaf_end
+    if cursor < end:
+        windows.extend((s, e, None) for s, e in generate_date_ranges(cursor, end))
+
+    # Unknown counts (new days, failed fetches) are never merged
+    merged = []
+    for window_start, window_end, articles in windows:
+        if merged and articles is not None and merged[-1][2] is not None \
+                and merged[-1][2] + articles < RESULT_CAP * SPARSE_FRACTION:
+            merged[-1] = (merged[-1][0], window_end, merged[-1][2] + articles)
+        else:
+            merged.append((window_start, window_end, articles))
+    return [(window_start, window_end) for window_start, window_end, _ in merged]
+
+def build_feed_url(query, start, end):
+    encoded_query = quote_plus(f"{query} after:{start} before:{end}")
+    return f"https://news.google.com/rss/search?q={encoded_query}&hl=en-IN&gl=IN&ceid=IN:en"
+
+# Sentiment Score is filled in later by score_sentiment(), once per distinct summary
+def article_row(entry):
+    summary = clean_html(entry.get("summary", ""), separator="", strip=False)
+    return {
+        "Title": entry.get("title", "N/A"),
+        "Link": canonical_url(entry.get("link", "")) or "N/A",
+        "Published": entry.get("published", "N/A"),
+        "Summary": summary,
+        "Source": entry.get("source", {}).get("title", "Google News"),
+        "Author": entry.get("author", "N/A"),
+        "Publisher Domain": urlparse(entry.get("link", "")).netloc,
+        "Sentiment Score": None,
+        "Scraped Time": datetime.utcnow().isoformat()
+    }
+
+# Fetch one search window, waiting on the shared rate limiter before every attempt
+def fetch_window(query, start, end, limiter):
+    feed_url = build_feed_url(query, start, end)
+    last_error = None
+    for _ in range(MAX_ATTEMPTS):
+        limiter.acquire()
         try:
-            feed = feedparser.parse(feed_url)
-            for entry in feed.entries:
-                summary = BeautifulSoup(entry.get("summary", ""), "html.parser").get_text()
-                sentiment = TextBlob(summary).sentiment.polarity
-                all_articles.append({
-                    "Title": entry.get("title", "N/A"),
-                    "Link": entry.get("link", "N/A"),
-                    "Published": entry.get("published", "N/A"),
-                    "Summary": summary,
-                    "Source": entry.get("source", {}).get("title", "Google News"),
-                    "Author": entry.get("author", "N/A"),
-                    "Publisher Domain": urlparse(entry.get("link", "")).netloc,
-                    "Sentiment Score": round(sentiment, 3),
-                    "Scraped Time": datetime.utcnow().isoformat()
-                })
-        except Exception as e:
-            print(f"❌ Error fetching data for {country_name}: {e}")
-
-    return all_articles
-
-# Create output folders if not already present (optional safety)
-os.makedirs("historical_data/csv", exist_ok=True)
-os.makedirs("historical_data/xlsx", exist_ok=True)
-
-# Prepare summary data container
-summary_rows = []
-
-# Process each country and save the results
-for country_code, query in countries.items():
-    print(f"\n📥 Processing country: {query}")
-    articles = fetch_articles_for_country(country_code, query)
-    df = pd.DataFrame(articles)
+            response = session.get(feed_url, timeout=15)
+        except requests.exceptions.RequestException as e:
+            last_error = e
+            limiter.throttled()
+            continue
+        if response.status_code in RETRY_STATUSES:
+            last_error = f"HTTP {response.status_code}"
+            limiter.throttled(retry_after_seconds(response))
+            print(f"⏳ {query} {start}..{end}: {last_error}, backing off to {limiter.rate:.2f} req/s")
+            continue
+        response.raise_for_status()
+        limiter.succeeded()
+        return [article_row(entry) for entry in parse_feed(response.content).entries]
+    raise RuntimeError(f"gave up after {MAX_ATTEMPTS} attempts ({last_error})")
+
+# A window fetched before a crash is read back from the checkpoint instead of requested again
+def fetch_checkpointed(checkpoint, country_code, start, end, limiter):
+    rows = checkpoint.get(country_code, start, end)
+    if rows is not None:
+        return rows, True
+    rows = fetch_window(countries[country_code], start, end, limiter)
+    checkpoint.save(country_code, start, end, rows)
+    return rows, False
+
+# Keep the first row per link; rows without one are all kept
+def dedupe_by_link(rows):
+    seen = set()
+    unique = []
+    for row in rows:
+        link = row.get("Link")
+        if link and link != "N/A":
+            if link in seen:
+                continue
+            seen.add(link)
+        unique.append(row)
+    return unique
+
+# Fetch every (country, window) search in parallel, splitting windows that hit the result cap
+def fetch_all_countries(plans, limiter, checkpoint, workers=HISTORICAL_WORKERS):
+    """
+    Args:
+        plans: {country_code: [(start, end), ...]} from plan_windows()
+        limiter: AdaptiveRateLimiter shared by every request
+        checkpoint: BackfillCheckpoint every fetched window is saved to
+        workers: Concurrent searches
 
-    csv_path = f"historical_data/csv/historical_data_{country_code}.csv"
-    xlsx_path = f"historical_data/xlsx/historical_data_{country_code}.xlsx"
+    Returns:
+        {country_code: (articles, coverage)}: articles in window order and
+        deduplicated by link (a split window keeps what it returned itself),
+        coverage one entry per leaf window with its article count and whether
+        it was still truncated at a single day
+    """
+    results = {code: [] for code in plans}
+    coverage = {code: [] for code in plans}
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}
 
-    df.to_csv(csv_path, index=False)
-    df.to_excel(xlsx_path, index=False)
+        def submit(code, start, end):
+            pending[executor.submit(fetch_checkpointed, checkpoint, code, start, end, limiter)] = (code, start, end)
 
-    print(f"✅ Saved data for {query}:")
-    print(f"   → {csv_path}")
-    print(f"   → {xlsx_path}")
+        for code, windows in plans.items():
+            for start, end in windows:
+                submit(code, start, end)
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                code, start, end = pending.pop(future)
+                done += 1
+                leaf = {"start": str(start), "end": str(end)}
+                try:
+                    rows, resumed = future.result()
+                except Exception as e:
+                    print(f"❌ Error fetching data for {code} {start}..{end}: {e}")
+                    coverage[code].append({**leaf, "articles": None, "truncated": False, "error": str(e)})
+                    continue
+
+                results[code].append((start, end, rows))
+                halves = split_window(start, end) if len(rows) >= RESULT_CAP else None
+                if halves:
+                    print(f"✂️ [{done}/{done + len(pending)}] {countries[code]} {start}..{end}: "
+                          f"{len(rows)} articles hit the cap, splitting" + (" (checkpoint)" if resumed else ""))
+                    for half_start, half_end in halves:
+                        submit(code, half_start, half_end)
+                else:
+                    truncated = len(rows) >= RESULT_CAP
+                    print(f"🔍 [{done}/{done + len(pending)}] {countries[code]} {start}..{end}: {len(rows)} articles"
+                          + (" (truncated, single day)" if truncated else "") + (" (checkpoint)" if resumed else ""))
+                    coverage[code].append({**leaf, "articles": len(rows), "truncated": truncated})
+
+    # Date order, parents before the halves they were split into
+    return {
+        code: (
+            dedupe_by_link(row for _, _, rows in sorted(results[code], key=lambda r: (r[0], -r[1].toordinal())) for row in rows),
+            sorted(coverage[code], key=lambda leaf: leaf["start"])
+        )
+        for code in plans
+    }
+
+# Score every fetched summary in one batched pass over a process pool
+def score_sentiment(fetched, cache):
+    rows = [row for articles, _ in fetched.values() for row in articles]
+    started = time.monotonic()
+    scores, stats = score_texts([row["Summary"] for row in rows], cache)
+    for row, score in zip(rows, scores):
+        row["Sentiment Score"] = score
+    print(f"\n🧠 Sentiment: {stats['texts']} summaries, {stats['unique']} distinct, {stats['cached']} cached, "
+          f"{stats['scored']} scored in {time.monotonic() - started:.1f}s")
+
+# Day the stored data for a country reaches: the end of its last fetched
+# window, else the publication day of its newest stored article
+def covered_until(country_code, previous=None):
+    ends = [leaf["end"] for leaf in previous or [] if leaf.get("articles") is not None]
+    if ends:
+        return date.fromisoformat(max(ends))
+    published = parquet_store.read(
+        "historical", filter=ds.field("Country") == countries[country_code], columns=["Published"]
+    )["Published"]
+    latest = pd.to_datetime(published, utc=True, errors="coerce", format="mixed").max()
+    return None if pd.isna(latest) else latest.date()
+
+def complete_months(coverage):
+    """
+    "YYYY-MM" months every day of which a window fetched in full
+
+    A month touched by a failed or capped window, or only partly inside the
+    fetched range, is not complete: the run doesn't hold all of its articles.
+    """
+    fetched_days = set()
+    for leaf in coverage:
+        if leaf["articles"] is not None and not leaf["truncated"]:
+            day, end = date.fromisoformat(leaf["start"]), date.fromisoformat(leaf["end"])
+            while day < end:
+                fetched_days.add(day)
+                day += timedelta(days=1)
+
+    complete = set()
+    for month in {day.replace(day=1) for day in fetched_days}:
+        following = (month + timedelta(days=32)).replace(day=1)
+        if all(month + timedelta(days=offset) in fetched_days for offset in range((following - month).days)):
+            complete.add(month.strftime("%Y-%m"))
+    return complete
+
+# Store one country's articles and return its summary row
+def save_country(country_code, query, articles, coverage, incremental=False):
+    df = pd.DataFrame(articles)
+    df["Country"] = query
+
+    if incremental:
+        # A top-up only adds files, skipping links the store already holds
+        stored_links = set(parquet_store.read("historical", filter=ds.field("Country") == query, columns=["Link"])["Link"])
+        if not df.empty:
+            df = df[~df["Link"].isin(stored_links)]
+        parquet_store.append(df, "historical")
+        print(f"✅ Added {len(df)} new articles for {query} to {parquet_store.STORE_DIR}/historical")
+        df = parquet_store.read("historical", filter=ds.field("Country") == query)
+    else:
+        # A full re-fetch replaces the months it fetched completely. Months with a
+        # failed or capped window keep what is stored and only gain new links, so
+        # a bad window never wipes or truncates a month
+        complete = complete_months(coverage)
+        if not df.empty:
+            partial_months = ~parquet_store.published_months(df, "historical").isin(complete)
+            stored_links = set(parquet_store.read(
+                "historical",
+                filter=(ds.field("Country") == query) & ~ds.field("Published Month").isin(sorted(complete)),
+                columns=["Link"]
+            )["Link"])
+            df = df[~(partial_months & df["Link"].isin(stored_links))]
+        parquet_store.replace_months(df, "historical", query, complete)
+        print(f"✅ Saved data for {query} to {parquet_store.STORE_DIR}/historical "
+              f"({len(complete)} months replaced, the rest topped up)")
+        df = parquet_store.read("historical", filter=ds.field("Country") == query)
     print(f"   📊 Total articles: {len(df)}")
 
+    # Optional CSV / XLSX views (SCRAPER_EXPORTS=csv,xlsx)
+    if parquet_store.EXPORT_FORMATS:
+        csv_path = f"historical_data/csv/historical_data_{country_code}.csv" if "csv" in parquet_store.EXPORT_FORMATS else None
+        xlsx_path = f"historical_data/xlsx/historical_data_{country_code}.xlsx" if "xlsx" in parquet_store.EXPORT_FORMATS else None
+        parquet_store.export(df.drop(columns=["Country", "Published Month"], errors="ignore"), csv_path, xlsx_path)
+        for path in filter(None, (csv_path, xlsx_path)):
+            print(f"   → {path}")
+
     # Prepare summary info
     if not df.empty:
         unique_sources = sorted(df['Source'].dropna().unique())
@@ -92,22 +346,98 @@ for country_code, query in countries.items():
     else:
         agency_str = "N/A"
 
-    summary_rows.append({
+    return {
         "Country": query,
         "News Agency": agency_str,
         "Total Articles Downloaded": len(df),
-        "Total Historical Data": "Since " + start_date.strftime("%Y")
-    })
+        "Total Historical Data": "Since " + start_date.strftime("%Y"),
+        "Windows": len(coverage),
+        "Failed Windows": sum(1 for leaf in coverage if leaf["articles"] is None),
+        "Truncated Windows": ", ".join(f"{leaf['start']}..{leaf['end']}" for leaf in coverage if leaf["truncated"]) or "None"
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill a year of Google News articles per country")
+    parser.add_argument("--countries", nargs="+", choices=sorted(countries), default=list(countries),
+                        help="country codes to fetch (default: all)")
+    parser.add_argument("--workers", type=int, default=HISTORICAL_WORKERS,
+                        help="concurrent searches (HISTORICAL_WORKERS, default 8)")
+    parser.add_argument("--rate", type=float, default=REQUESTS_PER_SECOND,
+                        help="requests per second across all workers (HISTORICAL_REQUESTS_PER_SECOND, default 1)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only fetch the days after what is already stored")
+    parser.add_argument("--fresh", action="store_true",
+                        help="ignore the checkpoint of an unfinished run and start over")
+    args = parser.parse_args()
+    mode = "incremental" if args.incremental else "full"
+
+    previous = load_coverage()
+    checkpoint = BackfillCheckpoint()
+    pending = None if args.fresh else checkpoint.pending_plan()
+    if pending and pending["mode"] == mode and sorted(pending["countries"]) == sorted(args.countries):
+        # Same windows as the interrupted run, even if the date has moved on since
+        plans = {
+            code: [(date.fromisoformat(start), date.fromisoformat(end)) for start, end in windows]
+            for code, windows in pending["countries"].items()
+        }
+        print(f"♻️ Resuming the {mode} run started {pending['started_at']} "
+              f"({checkpoint.completed()} windows already fetched)")
+    else:
+        if pending:
+            print(f"⚠️ Discarding the unfinished {pending['mode']} run started {pending['started_at']}")
+        plans = {}
+        for code in args.countries:
+            since = start_date.date()
+            if args.incremental:
+                since = max(since, covered_until(code, previous.get(code)) or since)
+            plans[code] = plan_windows(since, end_date.date(), previous.get(code))
+        checkpoint.start({
+            "mode": mode,
+            "started_at": datetime.utcnow().isoformat(),
+            "countries": {code: [[str(start), str(end)] for start, end in windows] for code, windows in plans.items()}
+        })
+
+    limiter = AdaptiveRateLimiter(args.rate)
+    started = time.monotonic()
+    print(f"\n📥 Fetching {', '.join(countries[code] for code in args.countries)} "
+          f"({sum(len(windows) for windows in plans.values())} windows planned, {mode}) "
+          f"with {args.workers} workers at up to {args.rate} req/s")
+    fetched = fetch_all_countries(plans, limiter, checkpoint, args.workers)
+    score_sentiment(fetched, SentimentCache())
+
+    # Process each country and save the results
+    summary_rows = []
+    for country_code in args.countries:
+        articles, coverage = fetched[country_code]
+        print(f"\n📥 Processing country: {countries[country_code]}")
+        for leaf in coverage:
+            if leaf["truncated"]:
+                print(f"   ⚠️ {leaf['start']}..{leaf['end']} still returned {leaf['articles']} articles (cap) as a single day")
+        if args.incremental:
+            # Earlier windows stay covered; this run only added the days after them
+            since = str(plans[country_code][0][0]) if plans[country_code] else "9999-12-31"
+            coverage = [leaf for leaf in previous.get(country_code, []) if leaf["end"] <= since] + coverage
+        summary_rows.append(save_country(country_code, countries[country_code], articles, coverage, args.incremental))
+        previous[country_code] = coverage
+    save_coverage(previous)
+
+    # Create summary DataFrame
+    summary_df = pd.DataFrame(summary_rows)
 
-# Create summary DataFrame
-summary_df = pd.DataFrame(summary_rows)
+    # Save summary CSV and XLSX
+    os.makedirs("historical_data", exist_ok=True)
+    summary_csv_path = "historical_data/summary.csv"
+    summary_xlsx_path = "historical_data/summary.xlsx"
 
-# Save summary CSV and XLSX
-summary_csv_path = "historical_data/summary.csv"
-summary_xlsx_path = "historical_data/summary.xlsx"
+    summary_df.to_csv(summary_csv_path, index=False)
+    summary_df.to_excel(summary_xlsx_path, index=False)
 
-summary_df.to_csv(summary_csv_path, index=False)
-summary_df.to_excel(summary_xlsx_path, index=False)
+    checkpoint.finish()
+    report = limiter.report()
+    print("\n✅ Finished processing all countries.")
+    print(f"⏱️ {time.monotonic() - started:.0f}s wall time, {report['requests']} requests, "
+          f"{report['throttled']} throttled, final rate {report['rate']} req/s")
+    print(f"Summary saved to:\n → {summary_csv_path}\n → {summary_xlsx_path}\n → {COVERAGE_PATH}")
 
-print("\n✅ Finished processing all countries.")
-print(f"Summary saved to:\n → {summary_csv_path}\n → {summary_xlsx_path}")
+if __name__ == "__main__":
+    main()
@@ -1,83 +1,123 @@
-import feedparser
 import pandas as pd
 import requests
 from datetime import datetime
-from bs4 import BeautifulSoup
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
-import os
-
-# Load RSS feed URLs
-with open('utils/rss_feeds.txt') as f:
-    rss_urls = [line.strip() for line in f if not line.startswith('#') and line.strip()]
-
-news_data = []
+from utils.feed_fetcher import fetch_feeds_concurrently, MAX_WORKERS
+from utils.http_cache import ValidatorCache
+from utils.seen_index import SeenIndex, article_key
+from utils.feed_registry import load_feed_registry
+from utils.feed_health import FeedHealth
+from utils.html_cleaner import clean_html
+from utils.feed_parser import parse_feed
+from utils.near_duplicates import canonical_url
+from utils import metrics, parquet_store
+import time
+
+# Load RSS feeds and their metadata
+feeds = load_feed_registry()
+rss_urls = list(feeds)
+
+# Output columns
+output_columns = [
+    "Title", "Publication Date", "Source", "News URL", "Summary", "Country",
+    "Author", "Category", "GUID", "Image URL", "Language", "Scraped Timestamp"
+]
+required_fields = ["Title", "Publication Date", "Source", "News URL", "Summary", "Country"]
 
 # Setup a requests session with retry and headers
 session = requests.Session()
-retries = Retry(total=3, backoff_factor=1, status_forcelist=[403, 404, 500, 502, 503, 504])
-adapter = HTTPAdapter(max_retries=retries)
+retries = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])  # permanent 4xx are never retried
+adapter = HTTPAdapter(max_retries=retries, pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
 session.mount("http://", adapter)
 session.mount("https://", adapter)
 session.headers.update({
     'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36'
 })
 
+# Remembers each feed's ETag / Last-Modified so unchanged feeds answer 304
+validator_cache = ValidatorCache("csv")
+
+# Articles written by earlier runs are skipped before any cleaning or writing
+seen_index = SeenIndex("csv")
+
+# Consecutive failures, latency and circuit breaker state per feed
+feed_health = FeedHealth("csv")
+
 def fetch_news(url):
+    articles = []
+    if not feed_health.allow(url):
+        print(f"⛔ Circuit open, skipping: {url}")
+        metrics.feed_polls.labels(feed=url, outcome="circuit_open").inc()
+        return articles
+
+    started = time.monotonic()
     try:
         print(f"🔍 Fetching from: {url}")
-        response = session.get(url, timeout=10)
+        response = session.get(url, timeout=10, headers=validator_cache.headers_for(url))
+        latency = time.monotonic() - started
+        metrics.feed_stage_seconds.labels(feed=url, stage="fetch").observe(latency)
+        if response.status_code == 304:
+            print(f"⏭️ Not modified since last run: {url}")
+            feed_health.record_success(url, latency)
+            metrics.feed_polls.labels(feed=url, outcome="not_modified").inc()
+            return articles
         response.raise_for_status()
+        metrics.feed_bytes.labels(feed=url).inc(len(response.content))
 
-        feed = feedparser.parse(response.content)
+        with metrics.feed_stage_seconds.labels(feed=url, stage="parse").time():
+            feed = parse_feed(response.content)
 
+        skipped = 0
+        cleaning = 0.0
         for entry in feed.entries:
+            # Links lose their tracking parameters; the guid stays as the feed
+            # sent it, since it is the upsert and seen-index key
+            guid = entry.get("id", entry.get("guid", "")).strip()
+            link = canonical_url(entry.get("link", ""))
+            if seen_index.contains(article_key(guid, link)):
+                skipped += 1
+                continue
+
             summary_html = entry.get("summary", "")
+            cleaning_started = time.perf_counter()
             summary_text = clean_html(summary_html)
-
-            news_data.append({
-                "Title": entry.get("title", "").strip() or "Title Not Found",
-                "Publication Date": entry.get("published", "").strip() or "Publication Date Not Found",
-                "Source": feed.feed.get("title", "").strip() or "Source Not Found",
-                "News URL": entry.get("link", "").strip() or "URL Not Found",
-                "Summary": summary_text or "Summary Not Found",
-                "Country": get_country_from_url(url),
-                "Author": entry.get("author", "").strip() or "Author Not Found",
-                "Category": extract_category(entry).strip() or "Category Not Found",
-                "GUID": entry.get("id", entry.get("guid", "")).strip() or "GUID Not Found",
-                "Image URL": extract_image_url(entry).strip() or "Image URL Not Found",
-                "Language": feed.feed.get("language", "").strip() or "Language Not Found",
+            cleaning += time.perf_counter() - cleaning_started
+
+            articles.append({
+                "Title": entry.get("title", "").strip() or None,
+                "Publication Date": entry.get("published", "").strip() or None,
+                "Source": feed.feed.get("title", "").strip() or None,
+                "News URL": link or None,
+                "Summary": summary_text or None,
+                "Country": feeds[url]["country"],
+                "Author": entry.get("author", "").strip() or None,
+                "Category": extract_category(entry).strip() or None,
+                "GUID": guid or None,
+                "Image URL": extract_image_url(entry).strip() or None,
+                "Language": feed.feed.get("language", "").strip() or feeds[url]["language"],
                 "Scraped Timestamp": datetime.utcnow().isoformat()
             })
 
+        if skipped:
+            print(f"⏭️ Skipped {skipped} already-seen entries from: {url}")
+        validator_cache.update(url, response)
+        feed_health.record_success(url, latency)
+        metrics.feed_stage_seconds.labels(feed=url, stage="clean").observe(cleaning)
+        metrics.feed_articles.labels(feed=url, status="new").inc(len(articles))
+        metrics.feed_articles.labels(feed=url, status="seen").inc(skipped)
+        metrics.feed_polls.labels(feed=url, outcome="ok").inc()
+
     except requests.exceptions.RequestException as req_err:
         print(f"❌ Network error with {url}: {req_err}")
+        status = req_err.response.status_code if req_err.response is not None else None
+        feed_health.record_failure(url, time.monotonic() - started, str(req_err), status)
+        metrics.feed_polls.labels(feed=url, outcome="error").inc()
     except Exception as e:
         print(f"❌ General error with {url}: {e}")
-
-def get_country_from_url(url):
-    url = url.lower()
-    if 'cnn' in url or 'nytimes' in url: return 'USA'
-    if 'bbc' in url: return 'UK'
-    if 'cbc' in url: return 'Canada'
-    if 'timesofindia' in url or 'thehindu' in url: return 'India'
-    if 'abc.net.au' in url: return 'Australia'
-    if 'dw.com' in url: return 'Germany'
-    if 'france24' in url: return 'France'
-    if 'nhk.or.jp' in url: return 'Japan'
-    if 'xinhuanet' in url: return 'China'
-    if 'straitstimes' in url: return 'Singapore'
-    if 'thestar.com.my' in url: return 'Malaysia'
-    if 'jakartapost' in url: return 'Indonesia'
-    if 'koreatimes' in url: return 'South Korea'
-    if 'rt.com' in url: return 'Russia'
-    if 'globo.com' in url: return 'Brazil'
-    if 'news24' in url: return 'South Africa'
-    if 'gulfnews' in url: return 'UAE'
-    if 'aljazeera' in url: return 'Qatar'
-    if 'hurriyetdailynews' in url: return 'Turkey'
-    if 'ansa.it' in url: return 'Italy'
-    return 'Unknown'
+        feed_health.record_failure(url, time.monotonic() - started, str(e))
+        metrics.feed_polls.labels(feed=url, outcome="error").inc()
+    return articles
 
 def extract_category(entry):
     if "tags" in entry:
@@ -94,33 +134,47 @@ def extract_image_url(entry):
         return entry.image.get("href", "")
     return ""
 
-def clean_html(raw_html):
-    if not raw_html:
-        return ""
-    soup = BeautifulSoup(raw_html, "html.parser")
-    return soup.get_text(separator=" ", strip=True)
-
-# Fetch all feeds
-for url in rss_urls:
-    fetch_news(url)
-
-# Create DataFrame
-df = pd.DataFrame(news_data)
-df.drop_duplicates(subset=["News URL"], inplace=True)
+def drop_duplicate_urls(df):
+    # Dedup on URL, but never collapse the rows that have no URL at all
+    return df[~(df["News URL"].duplicated() & df["News URL"].notna())]
 
-# Completeness check
-required_fields = ["Title", "Publication Date", "Source", "News URL", "Summary", "Country"]
-def compute_completeness(row):
-    return sum(bool(row[field]) and row[field] not in [f"{field} Not Found" for field in required_fields] for field in required_fields)
-df["Completeness"] = df.apply(compute_completeness, axis=1)
-df.sort_values(by="Completeness", ascending=False, inplace=True)
-df.drop(columns=["Completeness"], inplace=True)
-
-# Save output
-os.makedirs("rss_scraped_data/csv", exist_ok=True)
-os.makedirs("rss_scraped_data/xlsx", exist_ok=True)
-
-df.to_csv("rss_scraped_data/csv/rss_scraped_data_output.csv", index=False, encoding='utf-8')
-df.to_excel("rss_scraped_data/xlsx/rss_scraped_data_output.xlsx", index=False, engine='openpyxl')
+def sort_by_completeness(df):
+    # Most complete rows first, keeping the existing order within ties
+    completeness = df[required_fields].notna().sum(axis=1)
+    return df.loc[completeness.sort_values(ascending=False, kind="stable").index]
 
-print("✅ News saved to rss_scraped_data/csv/rss_scraped_data_output.csv and rss_scraped_data/xlsx/rss_scraped_data_output.xlsx")
+# Fetch all feeds
+run_started = time.monotonic()
+news_data = []
+for articles in fetch_feeds_concurrently(rss_urls, fetch_news):
+    news_data.extend(articles)
+
+# Create DataFrame of this run's new articles
+df = drop_duplicate_urls(pd.DataFrame(news_data, columns=output_columns))
+
+# Append them to the partitioned Parquet store; earlier runs' files are never rewritten
+with metrics.upsert_batch_seconds.labels(storage="parquet").time():
+    written = parquet_store.append(df, "rss_scraped")
+metrics.upserted_rows.labels(result="inserted").inc(written)
+seen_index.mark_seen(article_key(row["GUID"], row["News URL"]) for row in news_data)
+seen_index.prune()
+# Only now that the rows are in the store may a 304 skip these feeds next time
+validator_cache.commit()
+validator_cache.save()
+feed_health.save()
+metrics.run_seconds.labels(scraper="rss_scraper").observe(time.monotonic() - run_started)
+metrics.last_run_timestamp.labels(scraper="rss_scraper").set(time.time())
+metrics.flush("rss_scraper")
+print(f"✅ {written} new articles appended to {parquet_store.STORE_DIR}/rss_scraped")
+
+# Optional CSV / XLSX views of the whole store (SCRAPER_EXPORTS=csv,xlsx)
+if parquet_store.EXPORT_FORMATS:
+    stored = parquet_store.read("rss_scraped").sort_values("Scraped Timestamp", ascending=False, kind="stable")
+    export_df = sort_by_completeness(drop_duplicate_urls(stored))[output_columns]
+    export_df["Scraped Timestamp"] = export_df["Scraped Timestamp"].dt.strftime("%Y-%m-%dT%H:%M:%S.%f")
+    parquet_store.export(
+        export_df,
+        csv_path="rss_scraped_data/csv/rss_scraped_data_output.csv" if "csv" in parquet_store.EXPORT_FORMATS else None,
+        xlsx_path="rss_scraped_data/xlsx/rss_scraped_data_output.xlsx" if "xlsx" in parquet_store.EXPORT_FORMATS else None
+    )
+    print(f"📤 Exported {len(export_df)} articles as {', '.join(sorted(parquet_store.EXPORT_FORMATS))} under rss_scraped_data/")
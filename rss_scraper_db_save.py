@@ -1,90 +1,152 @@
-import feedparser
 import pandas as pd
 import requests
 from datetime import datetime
-from bs4 import BeautifulSoup
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
-from supabase import create_client, Client
+from utils.feed_fetcher import fetch_feeds_concurrently, MAX_WORKERS
+from utils.http_cache import ValidatorCache
+from utils.seen_index import SeenIndex, article_key
+from utils.feed_registry import load_feed_registry
+from utils.feed_health import FeedHealth
+from utils.html_cleaner import clean_html
+from utils.feed_parser import parse_feed
+from utils import metrics
+from utils.near_duplicates import NearDuplicateIndex, canonical_url
+from utils.search_index import SearchIndex
+from utils.stats_aggregates import ArticleAggregates
+from utils.storage import create_storage
 import os
+import time
 
-# -------------------------- SUPABASE CONFIG --------------------------
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_ANON_KEY")
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-TABLE_NAME = "news_feed"
+# -------------------------- STORAGE CONFIG --------------------------
+# Supabase by default, or a local SQLite file with STORAGE_BACKEND=sqlite
+storage = create_storage()
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "500"))
+# "keep" stores near-duplicates and only clusters them; "skip" leaves out
+# articles that near-duplicate one already stored under another guid
+NEAR_DUPLICATES = os.getenv("NEAR_DUPLICATES", "keep").strip().lower()
 
-# -------------------------- FEED URLS --------------------------
-with open('utils/rss_feeds.txt') as f:
-    rss_urls = [line.strip() for line in f if not line.startswith('#') and line.strip()]
+# -------------------------- FEED REGISTRY --------------------------
+feeds = load_feed_registry()
+rss_urls = list(feeds)
 
 # -------------------------- SETUP SESSION --------------------------
 session = requests.Session()
-retries = Retry(total=3, backoff_factor=1, status_forcelist=[403, 404, 500, 502, 503, 504])
-adapter = HTTPAdapter(max_retries=retries)
+retries = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])  # permanent 4xx are never retried
+adapter = HTTPAdapter(max_retries=retries, pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
 session.mount("http://", adapter)
 session.mount("https://", adapter)
 session.headers.update({
     'User-Agent': 'Mozilla/5.0'
 })
 
-news_data = []
+# Remembers each feed's ETag / Last-Modified so unchanged feeds answer 304
+validator_cache = ValidatorCache("supabase")
+
+# Articles written by earlier runs are skipped before any cleaning or writing
+seen_index = SeenIndex("supabase")
+
+# Consecutive failures, latency and circuit breaker state per feed
+feed_health = FeedHealth("supabase")
+
+# Full-text index the API ranks /api/news/search?q= matches with
+search_index = SearchIndex()
+
+# Counts by category, source, country, language and day served by /api/stats
+stats_aggregates = ArticleAggregates()
+
+# Clusters the same story across sources for /api/news?collapse=true
+near_duplicates = NearDuplicateIndex()
 
 # -------------------------- FUNCTIONS --------------------------
-def fetch_news(url):
+def fetch_news(url, completed=None):
+    """
+    Fetch one feed's new articles
+
+    Args:
+        url: Feed url
+        completed: Optional set the url is added to when the poll completes
+            (200 or 304), as opposed to an error or an open circuit
+
+    Returns:
+        Article dicts for entries not seen before; empty for a failed poll too
+    """
+    articles = []
+    if not feed_health.allow(url):
+        print(f"⛔ Circuit open, skipping: {url}")
+        metrics.feed_polls.labels(feed=url, outcome="circuit_open").inc()
+        return articles
+
+    started = time.monotonic()
     try:
         print(f"🔍 Fetching from: {url}")
-        response = session.get(url, timeout=10)
+        response = session.get(url, timeout=10, headers=validator_cache.headers_for(url))
+        latency = time.monotonic() - started
+        metrics.feed_stage_seconds.labels(feed=url, stage="fetch").observe(latency)
+        if response.status_code == 304:
+            print(f"⏭️ Not modified since last run: {url}")
+            feed_health.record_success(url, latency)
+            metrics.feed_polls.labels(feed=url, outcome="not_modified").inc()
+            if completed is not None:
+                completed.add(url)
+            return articles
         response.raise_for_status()
-        feed = feedparser.parse(response.content)
+        metrics.feed_bytes.labels(feed=url).inc(len(response.content))
+        with metrics.feed_stage_seconds.labels(feed=url, stage="parse").time():
+            feed = parse_feed(response.content)
 
+        skipped = 0
+        cleaning = 0.0
         for entry in feed.entries:
+            # Links lose their tracking parameters; the guid stays as the feed
+            # sent it, since it is the upsert and seen-index key
+            guid = entry.get("id", entry.get("guid", "")).strip()
+            link = canonical_url(entry.get("link", ""))
+            if seen_index.contains(article_key(guid, link)):
+                skipped += 1
+                continue
+
             summary_html = entry.get("summary", "")
+            cleaning_started = time.perf_counter()
             summary_text = clean_html(summary_html)
+            cleaning += time.perf_counter() - cleaning_started
 
-            news_data.append({
+            articles.append({
                 "title": entry.get("title", "").strip() or None,
                 "publication_date": entry.get("published", "").strip() or None,
                 "source": feed.feed.get("title", "").strip() or None,
-                "news_url": entry.get("link", "").strip() or None,
+                "news_url": link or None,
                 "summary": summary_text or None,
-                "country": get_country_from_url(url),
+                "country": feeds[url]["country"],
                 "author": entry.get("author", "").strip() or None,
                 "category": extract_category(entry).strip() or None,
-                "guid": entry.get("id", entry.get("guid", "")).strip() or None,
+                "guid": guid or None,
                 "image_url": extract_image_url(entry).strip() or None,
-                "language": feed.feed.get("language", "").strip() or None,
+                "language": feed.feed.get("language", "").strip() or feeds[url]["language"],
                 "scraped_timestamp": datetime.utcnow().isoformat()
             })
 
+        if skipped:
+            print(f"⏭️ Skipped {skipped} already-seen entries from: {url}")
+        validator_cache.update(url, response)
+        feed_health.record_success(url, latency)
+        metrics.feed_stage_seconds.labels(feed=url, stage="clean").observe(cleaning)
+        metrics.feed_articles.labels(feed=url, status="new").inc(len(articles))
+        metrics.feed_articles.labels(feed=url, status="seen").inc(skipped)
+        metrics.feed_polls.labels(feed=url, outcome="ok").inc()
+        if completed is not None:
+            completed.add(url)
+
     except requests.exceptions.RequestException as req_err:
         print(f"❌ Network error with {url}: {req_err}")
+        status = req_err.response.status_code if req_err.response is not None else None
+        feed_health.record_failure(url, time.monotonic() - started, str(req_err), status)
+        metrics.feed_polls.labels(feed=url, outcome="error").inc()
     except Exception as e:
         print(f"❌ General error with {url}: {e}")
-
-def get_country_from_url(url):
-    url = url.lower()
-    if 'cnn' in url or 'nytimes' in url: return 'USA'
-    if 'bbc' in url: return 'UK'
-    if 'cbc' in url: return 'Canada'
-    if 'timesofindia' in url or 'thehindu' in url: return 'India'
-    if 'abc.net.au' in url: return 'Australia'
-    if 'dw.com' in url: return 'Germany'
-    if 'france24' in url: return 'France'
-    if 'nhk.or.jp' in url: return 'Japan'
-    if 'xinhuanet' in url: return 'China'
-    if 'straitstimes' in url: return 'Singapore'
-    if 'thestar.com.my' in url: return 'Malaysia'
-    if 'jakartapost' in url: return 'Indonesia'
-    if 'koreatimes' in url: return 'South Korea'
-    if 'rt.com' in url: return 'Russia'
-    if 'globo.com' in url: return 'Brazil'
-    if 'news24' in url: return 'South Africa'
-    if 'gulfnews' in url: return 'UAE'
-    if 'aljazeera' in url: return 'Qatar'
-    if 'hurriyetdailynews' in url: return 'Turkey'
-    if 'ansa.it' in url: return 'Italy'
-    return 'Unknown'
+        feed_health.record_failure(url, time.monotonic() - started, str(e))
+        metrics.feed_polls.labels(feed=url, outcome="error").inc()
+    return articles
 
 def extract_category(entry):
     if "tags" in entry:
@@ -100,23 +162,151 @@ def extract_image_url(entry):
         return entry.image.get("href", "")
     return ""
 
-def clean_html(raw_html):
-    if not raw_html:
-        return ""
-    soup = BeautifulSoup(raw_html, "html.parser")
-    return soup.get_text(separator=" ", strip=True)
-
-def insert_to_supabase(data):
+def dedupe_by_guid(data):
+    # Postgres rejects an upsert that touches the same conflict key twice,
+    # so keep only the last copy of each guid before batching
+    latest = {}
+    without_guid = []
     for item in data:
+        if item["guid"] is None:
+            without_guid.append(item)
+        else:
+            latest[item["guid"]] = item
+    return list(latest.values()) + without_guid
+
+def upsert_batch(batch, existing_guids, stats, failed_rows=None):
+    try:
+        with metrics.upsert_batch_seconds.labels(storage=storage.name).time():
+            storage.upsert(batch)
+    except Exception as e:
+        if len(batch) == 1:
+            print(f"❌ Failed to upsert record: {batch[0]['guid']}, Error: {e}")
+            stats["failed"] += 1
+            metrics.upserted_rows.labels(result="failed").inc()
+            if failed_rows is not None:
+                failed_rows.append(batch[0])
+            return
+        # Split the batch so one bad row can't sink the rest of it
+        middle = len(batch) // 2
+        upsert_batch(batch[:middle], existing_guids, stats, failed_rows)
+        upsert_batch(batch[middle:], existing_guids, stats, failed_rows)
+        return
+
+    seen_index.mark_seen(article_key(item["guid"], item["news_url"]) for item in batch)
+    try:
+        search_index.add(batch)
+    except Exception as e:
+        print(f"⚠️ Could not update the search index, rerun python -m utils.search_index backfill: {e}")
+    try:
+        stats_aggregates.add(batch)
+    except Exception as e:
+        print(f"⚠️ Could not update the stats counters, rerun python -m utils.stats_aggregates rebuild: {e}")
+    try:
+        near_duplicates.add(batch)
+    except Exception as e:
+        print(f"⚠️ Could not update the near-duplicate clusters, rerun python -m utils.near_duplicates backfill: {e}")
+    updated = sum(1 for item in batch if item["guid"] in existing_guids)
+    stats["updated"] += updated
+    stats["inserted"] += len(batch) - updated
+    metrics.upserted_rows.labels(result="updated").inc(updated)
+    metrics.upserted_rows.labels(result="inserted").inc(len(batch) - updated)
+
+def drop_near_duplicates(rows):
+    # Only new guids are dropped; re-upserts of stored articles go through
+    try:
+        indexed = near_duplicates.clusters_of(item["guid"] for item in rows if item["guid"] is not None)
+        matches = near_duplicates.match(item for item in rows if item["guid"] is not None and item["guid"] not in indexed)
+    except Exception as e:
+        print(f"⚠️ Could not check for near-duplicates, storing everything: {e}")
+        return rows
+    if matches:
+        print(f"🧬 Skipped {len(matches)} near-duplicates of stored articles")
+        seen_index.mark_seen(article_key(item["guid"], item["news_url"]) for item in rows if item["guid"] in matches)
+    return [item for item in rows if item["guid"] not in matches]
+
+def upsert_articles(data, batch_size=UPSERT_BATCH_SIZE, failed_rows=None):
+    """
+    Upsert articles in batches, splitting failing batches down to the bad rows
+
+    Args:
+        data: Article dicts from fetch_news
+        batch_size: Rows per storage call
+        failed_rows: Optional list the rows that could not be written are appended to
+
+    Returns:
+        Dict with the inserted, updated and failed counts
+    """
+    stats = {"inserted": 0, "updated": 0, "failed": 0}
+    rows = dedupe_by_guid(data)
+    if NEAR_DUPLICATES == "skip":
+        rows = drop_near_duplicates(rows)
+
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
         try:
-            supabase.table(TABLE_NAME).upsert(item, on_conflict=["guid"]).execute()
+            existing_guids = storage.existing_guids([item["guid"] for item in batch if item["guid"] is not None])
         except Exception as e:
-            print(f"❌ Failed to upsert record: {item['guid']}, Error: {e}")
+            print(f"⚠️ Could not look up existing guids, counting batch as inserts: {e}")
+            existing_guids = set()
+        upsert_batch(batch, existing_guids, stats, failed_rows)
+
+    print(f"📊 Upsert summary: {stats['inserted']} inserted, {stats['updated']} updated, {stats['failed']} failed")
+    return stats
 
 # -------------------------- MAIN FLOW --------------------------
-for url in rss_urls:
-    fetch_news(url)
+def run_scrape(urls=rss_urls, on_start=None, on_feed_done=None):
+    """
+    Fetch the given feeds and upsert their new articles
+
+    Args:
+        urls: Feed urls to poll
+        on_start: Optional callback taking the number of feeds about to be fetched
+        on_feed_done: Optional callback taking (url, new_articles, seconds) as
+            each feed finishes, called from the fetch threads
+
+    Returns:
+        Dict with the number of new articles per feed url, the set of urls
+        whose poll completed (200 or 304; the rest failed or were skipped)
+        and the upsert summary
+    """
+    completed = set()
+
+    def fetch_and_report(url):
+        started = time.monotonic()
+        articles = fetch_news(url, completed)
+        if on_feed_done is not None:
+            on_feed_done(url, len(articles), time.monotonic() - started)
+        return articles
+
+    run_started = time.monotonic()
+    if on_start is not None:
+        on_start(len(urls))
+    news_data = []
+    new_articles = {}
+    feeds_of = {}
+    for url, articles in zip(urls, fetch_feeds_concurrently(urls, fetch_and_report)):
+        new_articles[url] = len(articles)
+        news_data.extend(articles)
+        for item in articles:
+            feeds_of.setdefault(article_key(item["guid"], item["news_url"]), set()).add(url)
+
+    print(f"📥 Total news fetched: {len(news_data)}")
+    failed_rows = []
+    stats = upsert_articles(news_data, failed_rows=failed_rows)
+    # A feed with rows that failed keeps its old validators, so the next run
+    # fetches it in full and retries them instead of getting a 304
+    incomplete = {url for item in failed_rows for url in feeds_of.get(article_key(item["guid"], item["news_url"]), ())}
+    if incomplete:
+        print(f"↩️ Not caching validators for {len(incomplete)} feeds with failed rows")
+    validator_cache.commit(set(urls) - incomplete)
+    seen_index.prune()
+    validator_cache.save()
+    feed_health.save()
+    metrics.run_seconds.labels(scraper="rss_scraper_db_save").observe(time.monotonic() - run_started)
+    metrics.last_run_timestamp.labels(scraper="rss_scraper_db_save").set(time.time())
+    metrics.flush("rss_scraper_db_save")
+    print(f"✅ Finished upserting to {storage.name}.")
+    return {"new_articles": new_articles, "completed": completed, "upsert": stats}
 
-print(f"📥 Total news fetched: {len(news_data)}")
-insert_to_supabase(news_data)
-print("✅ Data inserted/updated to Supabase table successfully.")
+if __name__ == "__main__":
+    run_scrape()
@@ -0,0 +1,39 @@
+import time
+from datetime import datetime
+
+# Imported once: the daemon reuses the scraper's session, caches and Supabase
+# client across polls instead of paying interpreter and import startup each time
+import rss_scraper_db_save as scraper
+from utils import metrics
+from utils.poll_schedule import PollSchedule
+
+MAX_SLEEP_SECONDS = 60  # wake up at least this often so new state is picked up promptly
+
+def main():
+    schedule = PollSchedule(scraper.feeds)
+    print(f"🕒 Scheduler started for {len(scraper.feeds)} feeds")
+    if metrics.METRICS_PORT:
+        # Long-running, so Prometheus scrapes it rather than each poll exporting
+        metrics.serve(metrics.METRICS_PORT)
+        print(f"📈 Metrics at http://0.0.0.0:{metrics.METRICS_PORT}/metrics")
+
+    try:
+        while True:
+            due = schedule.due_feeds()
+            if due:
+                print(f"\n⏰ {datetime.utcnow().isoformat()} polling {len(due)} due feeds")
+                result = scraper.run_scrape(due)
+                schedule.record_polls(result["new_articles"], result["completed"])
+                schedule.save()
+
+                for url in due:
+                    outcome = f"{result['new_articles'][url]} new" if url in result["completed"] else "poll failed"
+                    print(f"   → {url}: {outcome}, next poll in {schedule.next_poll_minutes(url):.0f} min")
+
+            time.sleep(max(1, min(schedule.seconds_until_next_poll(), MAX_SLEEP_SECONDS)))
+    except KeyboardInterrupt:
+        schedule.save()
+        print("👋 Scheduler stopped")
+
+if __name__ == "__main__":
+    main()
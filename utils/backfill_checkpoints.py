@@ -0,0 +1,95 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from utils.http_cache import CACHE_DIR
+
+# -------------------------- CHECKPOINT CONFIG --------------------------
+CHECKPOINT_PATH = os.getenv("HISTORICAL_CHECKPOINT_PATH", os.path.join(CACHE_DIR, "historical_checkpoints.sqlite3"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoint_run (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    plan TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS checkpoint_windows (
+    country TEXT NOT NULL,
+    start TEXT NOT NULL,
+    end TEXT NOT NULL,
+    articles TEXT NOT NULL,
+    fetched_at TEXT NOT NULL,
+    PRIMARY KEY (country, start, end)
+);
+"""
+
+
+class BackfillCheckpoint:
+    """
+    On-disk progress of one historical backfill run
+
+    The run's plan (mode, countries and their windows) is stored when it
+    starts and every window's articles as soon as they are fetched, so a run
+    that crashes or is killed picks up where it stopped instead of re-fetching
+    the year. finish() clears it once the results are in the Parquet store.
+    Safe to share between fetch threads.
+    """
+
+    def __init__(self, path=CHECKPOINT_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def pending_plan(self):
+        """Plan of an unfinished run, or None"""
+        with self._lock:
+            row = self._conn.execute("SELECT plan FROM checkpoint_run WHERE id = 1").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def start(self, plan):
+        """
+        Begin a new run, dropping whatever an unfinished one had fetched
+
+        Args:
+            plan: JSON-serialisable description of the run (its mode and
+                {country: [[start, end], ...]} windows)
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM checkpoint_windows")
+            self._conn.execute("INSERT OR REPLACE INTO checkpoint_run (id, plan) VALUES (1, ?)", (json.dumps(plan),))
+
+    def get(self, country, start, end):
+        """Articles already fetched for a window, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT articles FROM checkpoint_windows WHERE country = ? AND start = ? AND end = ?",
+                (country, str(start), str(end))
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, country, start, end, articles):
+        """Record a fetched window; committed before returning"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoint_windows (country, start, end, articles, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (country, str(start), str(end), json.dumps(articles), datetime.utcnow().isoformat())
+            )
+
+    def completed(self):
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM checkpoint_windows").fetchone()[0]
+
+    def finish(self):
+        """Forget the run once its results are stored"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM checkpoint_windows")
+            self._conn.execute("DELETE FROM checkpoint_run")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
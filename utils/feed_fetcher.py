@@ -0,0 +1,70 @@
+import os
+import threading
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+# -------------------------- CONCURRENCY CONFIG --------------------------
+# Global cap on feeds fetched at once and a smaller cap per host so a
+# publisher serving several of our feeds is never hit by all of them together.
+MAX_WORKERS = int(os.getenv("FEED_FETCH_WORKERS", "16"))
+PER_HOST_LIMIT = int(os.getenv("FEED_FETCH_PER_HOST", "2"))
+
+
+def get_host(url):
+    return urlparse(url).netloc.lower()
+
+
+def interleave_by_host(urls):
+    """
+    Order feed indexes round-robin across hosts
+
+    Feeds from the same host are spread out so workers don't all queue up
+    behind one host's limit while other hosts sit idle.
+    """
+    queues = defaultdict(deque)
+    for index, url in enumerate(urls):
+        queues[get_host(url)].append(index)
+
+    order = []
+    while queues:
+        for host in list(queues):
+            order.append(queues[host].popleft())
+            if not queues[host]:
+                del queues[host]
+    return order
+
+
+def fetch_feeds_concurrently(urls, fetch_fn, max_workers=MAX_WORKERS, per_host_limit=PER_HOST_LIMIT):
+    """
+    Run fetch_fn(url) for every feed on a bounded thread pool
+
+    Args:
+        urls: Feed URLs to fetch
+        fetch_fn: Callable taking a URL and returning that feed's result
+        max_workers: Maximum number of feeds fetched at the same time
+        per_host_limit: Maximum number of concurrent requests to one host
+
+    Returns:
+        List of results in the same order as urls, regardless of which
+        feed finished first
+    """
+    if not urls:
+        return []
+
+    host_slots = defaultdict(lambda: threading.BoundedSemaphore(per_host_limit))
+    slots_lock = threading.Lock()
+
+    def run(url):
+        with slots_lock:
+            slot = host_slots[get_host(url)]
+        with slot:
+            return fetch_fn(url)
+
+    results = [None] * len(urls)
+    workers = max(1, min(max_workers, len(urls)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {index: executor.submit(run, urls[index]) for index in interleave_by_host(urls)}
+        for index, future in futures.items():
+            results[index] = future.result()
+    return results
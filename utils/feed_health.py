@@ -0,0 +1,111 @@
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+
+from utils.http_cache import CACHE_DIR, read_json, write_json_atomic
+
+# -------------------------- BREAKER CONFIG --------------------------
+FAILURE_THRESHOLD = int(os.getenv("FEED_FAILURE_THRESHOLD", "3"))
+BASE_COOLDOWN_MINUTES = float(os.getenv("FEED_COOLDOWN_MINUTES", "30"))
+MAX_COOLDOWN_MINUTES = 24 * 60
+LATENCY_SMOOTHING = 0.3  # weight of the latest request in the average latency
+
+
+def is_permanent_error(status):
+    """4xx responses won't fix themselves on retry, except timeouts and rate limits"""
+    return status is not None and 400 <= status < 500 and status not in (408, 429)
+
+
+class FeedHealth:
+    """
+    Per-feed health record with a circuit breaker, persisted between runs
+
+    A feed that fails FAILURE_THRESHOLD times in a row (or once with a permanent
+    4xx) is skipped for a cooldown that doubles with every further failure. When
+    the cooldown ends the next poll goes through; success closes the breaker.
+    """
+
+    def __init__(self, name):
+        self.path = os.path.join(CACHE_DIR, f"feed_health_{name}.json")
+        self._lock = threading.Lock()
+        self._feeds = read_json(self.path, {})
+
+    def _state(self, url):
+        return self._feeds.setdefault(url, {
+            "polls": 0,
+            "failures": 0,
+            "consecutive_failures": 0,
+            "avg_latency_ms": None,
+            "wasted_seconds": 0.0,
+            "last_success": None,
+            "last_failure": None,
+            "last_error": None,
+            "open_until": None
+        })
+
+    def allow(self, url, now=None):
+        """False while the feed's breaker is open"""
+        now = now or datetime.utcnow()
+        with self._lock:
+            open_until = self._feeds.get(url, {}).get("open_until")
+        return open_until is None or datetime.fromisoformat(open_until) <= now
+
+    def record_success(self, url, latency):
+        with self._lock:
+            state = self._state(url)
+            latency_ms = latency * 1000
+            average = state["avg_latency_ms"]
+            state["avg_latency_ms"] = round(latency_ms if average is None else LATENCY_SMOOTHING * latency_ms + (1 - LATENCY_SMOOTHING) * average, 1)
+            state["polls"] += 1
+            state["consecutive_failures"] = 0
+            state["last_success"] = datetime.utcnow().isoformat()
+            state["open_until"] = None
+
+    def record_failure(self, url, elapsed, error, status=None):
+        """
+        Record a failed poll and trip the breaker if the feed keeps failing
+
+        Args:
+            url: Feed url
+            elapsed: Seconds spent on the failed poll, retries included
+            error: Error message to keep for the report
+            status: HTTP status code, if the server answered at all
+        """
+        now = datetime.utcnow()
+        with self._lock:
+            state = self._state(url)
+            state["polls"] += 1
+            state["failures"] += 1
+            state["consecutive_failures"] += 1
+            state["wasted_seconds"] = round(state["wasted_seconds"] + elapsed, 2)
+            state["last_failure"] = now.isoformat()
+            state["last_error"] = f"HTTP {status}: {error}" if status else error
+
+            if is_permanent_error(status) or state["consecutive_failures"] >= FAILURE_THRESHOLD:
+                extra_failures = max(0, state["consecutive_failures"] - FAILURE_THRESHOLD)
+                cooldown = min(MAX_COOLDOWN_MINUTES, BASE_COOLDOWN_MINUTES * 2 ** extra_failures)
+                state["open_until"] = (now + timedelta(minutes=cooldown)).isoformat()
+
+    def report(self):
+        """Feed health entries, the ones wasting the most time first"""
+        with self._lock:
+            rows = [{"url": url, **state} for url, state in self._feeds.items()]
+        now = datetime.utcnow()
+        for row in rows:
+            row["circuit"] = "open" if row["open_until"] and datetime.fromisoformat(row["open_until"]) > now else "closed"
+        return sorted(rows, key=lambda row: row["wasted_seconds"], reverse=True)
+
+    def save(self):
+        with self._lock:
+            snapshot = dict(self._feeds)
+        write_json_atomic(self.path, snapshot)
+
+
+if __name__ == "__main__":
+    # python -m utils.feed_health [csv|supabase]
+    for row in FeedHealth(sys.argv[1] if len(sys.argv) > 1 else "supabase").report():
+        print(f"{row['circuit']:<6} wasted={row['wasted_seconds']:>7.1f}s latency={row['avg_latency_ms'] or '-':>7}ms "
+              f"failures={row['consecutive_failures']}/{row['failures']} {row['url']}")
+        if row["last_error"] and row["consecutive_failures"]:
+            print(f"       last error: {row['last_error']}")
@@ -0,0 +1,196 @@
+from io import BytesIO
+
+import feedparser
+from feedparser import FeedParserDict
+
+try:
+    from lxml import etree
+except ImportError:  # lxml is optional: without it every feed goes through feedparser
+    etree = None
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+MEDIA = "{http://search.yahoo.com/mrss/}"
+DC = "{http://purl.org/dc/elements/1.1/}"
+CONTENT_ENCODED = "{http://purl.org/rss/1.0/modules/content/}encoded"
+XML_LANG = "{http://www.w3.org/XML/1998/namespace}lang"
+
+
+class UnsupportedFeed(Exception):
+    """Raised by the fast path for anything it doesn't mirror feedparser on"""
+
+
+def _text(element):
+    if element is None:
+        return None
+    if len(element):
+        raise UnsupportedFeed(f"markup inside <{element.tag}>")
+    return (element.text or "").strip()
+
+
+def _unique_tags(tags):
+    # feedparser drops repeated (term, scheme, label) categories
+    seen = set()
+    unique = []
+    for tag in tags:
+        key = (tag["term"], tag["scheme"], tag["label"])
+        if key not in seen:
+            seen.add(key)
+            unique.append(tag)
+    return unique
+
+
+def _media(item):
+    media = {}
+    # iter() also reaches thumbnails and content nested in <media:group>
+    for key, tag in (("media_thumbnail", MEDIA + "thumbnail"), ("media_content", MEDIA + "content")):
+        found = [dict(element.attrib) for element in item.iter(tag)]
+        if found:
+            media[key] = found
+    return media
+
+
+def _rss_item(item):
+    entry = FeedParserDict()
+    for key, tag in (("title", "title"), ("link", "link"), ("id", "guid"), ("published", "pubDate")):
+        value = _text(item.find(tag))
+        if value is not None:
+            entry[key] = value
+
+    # Like feedparser, a permalink <guid> (isPermaLink missing or "true")
+    # stands in for a missing <link>
+    guid = item.find("guid")
+    if "link" not in entry and "id" in entry:
+        is_permalink = {name.lower(): value for name, value in guid.attrib.items()}.get("ispermalink", "true")
+        if is_permalink == "true":
+            entry["link"] = entry["id"]
+
+    authors = item.findall("author") + item.findall(DC + "creator")
+    if len(authors) > 1 or any("@" in (author.text or "") for author in authors):
+        # feedparser splits "email (name)" forms and picks between several authors
+        raise UnsupportedFeed("ambiguous author")
+    if authors:
+        entry["author"] = _text(authors[0])
+
+    summary = item.find("description")
+    if summary is None:
+        summary = item.find(CONTENT_ENCODED)
+    if summary is not None:
+        entry["summary"] = _text(summary)
+
+    tags = _unique_tags(
+        FeedParserDict(term=_text(category), scheme=category.get("domain"), label=None)
+        for category in item.findall("category")
+    )
+    if tags:
+        entry["tags"] = tags
+
+    # Google News names each article's publisher in <source url="...">
+    source = item.find("source")
+    if source is not None:
+        entry["source"] = FeedParserDict(title=_text(source))
+        if source.get("url"):
+            entry["source"]["href"] = source.get("url")
+    entry.update(_media(item))
+    return entry
+
+
+def _atom_entry(item):
+    entry = FeedParserDict()
+    for key, tag in (("title", "title"), ("id", "id"), ("published", "published")):
+        value = _text(item.find(ATOM + tag))
+        if value is not None:
+            entry[key] = value
+
+    for link in item.findall(ATOM + "link"):
+        if link.get("rel", "alternate") == "alternate" and link.get("href"):
+            entry["link"] = link.get("href").strip()
+            break
+
+    author = item.find(ATOM + "author")
+    if author is not None:
+        name, email = _text(author.find(ATOM + "name")), _text(author.find(ATOM + "email"))
+        if name:
+            entry["author"] = f"{name} ({email})" if email else name
+
+    summary = item.find(ATOM + "summary")
+    if summary is None:
+        summary = item.find(ATOM + "content")
+    if summary is not None:
+        if summary.get("type") == "xhtml":
+            raise UnsupportedFeed("xhtml content")
+        entry["summary"] = _text(summary)
+
+    tags = _unique_tags(
+        FeedParserDict(term=category.get("term"), scheme=category.get("scheme"), label=category.get("label"))
+        for category in item.findall(ATOM + "category")
+    )
+    if tags:
+        entry["tags"] = tags
+    entry.update(_media(item))
+    return entry
+
+
+def _release(element):
+    # Drop finished entries so memory stays flat however long the feed is
+    element.clear()
+    parent = element.getparent()
+    while element.getprevious() is not None:
+        del parent[0]
+
+
+def parse_feed_fast(content):
+    """
+    Incrementally parse a well-formed RSS 2.0 or Atom document with lxml
+
+    Fills only the fields the scrapers read (feed title and language; entry
+    title, link, id, published, author, summary, tags, source (RSS only),
+    media_thumbnail and media_content) the way feedparser would.
+
+    Raises:
+        UnsupportedFeed: lxml is missing, the document isn't well-formed XML,
+            isn't RSS 2.0 / Atom, or uses markup the fast path doesn't mirror
+    """
+    if etree is None:
+        raise UnsupportedFeed("lxml is not installed")
+
+    feed = FeedParserDict()
+    entries = []
+    version = None
+    try:
+        for event, element in etree.iterparse(
+            BytesIO(content), events=("start", "end"), resolve_entities=False, no_network=True
+        ):
+            if version is None:
+                if element.tag == "rss":
+                    version, item_tag, channel_tags = "rss20", "item", ("channel",)
+                elif element.tag == ATOM + "feed":
+                    version, item_tag, channel_tags = "atom10", ATOM + "entry", (ATOM + "feed",)
+                    if element.get(XML_LANG):
+                        feed["language"] = element.get(XML_LANG)
+                else:
+                    raise UnsupportedFeed(f"root element <{element.tag}>")
+                continue
+            if event != "end":
+                continue
+
+            if element.tag == item_tag:
+                entries.append(_rss_item(element) if version == "rss20" else _atom_entry(element))
+                _release(element)
+            elif element.getparent() is not None and element.getparent().tag in channel_tags:
+                name = etree.QName(element).localname
+                if name == "title" and "title" not in feed:
+                    feed["title"] = _text(element)
+                elif name == "language" and version == "rss20" and "language" not in feed:
+                    feed["language"] = _text(element)
+    except etree.XMLSyntaxError as e:
+        raise UnsupportedFeed(f"not well-formed: {e}") from e
+
+    return FeedParserDict(feed=feed, entries=entries, bozo=False, version=version)
+
+
+def parse_feed(content):
+    """Parse a feed body, using the lxml fast path when it can and feedparser otherwise"""
+    try:
+        return parse_feed_fast(content)
+    except UnsupportedFeed:
+        return feedparser.parse(content)
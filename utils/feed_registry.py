@@ -0,0 +1,40 @@
+import json
+
+# -------------------------- REGISTRY CONFIG --------------------------
+REGISTRY_PATH = "utils/feed_registry.json"
+
+# Multiplier applied to a feed's learned polling interval
+PRIORITY_FACTORS = {
+    "high": 0.5,
+    "normal": 1.0,
+    "low": 2.0
+}
+
+
+def load_feed_registry(path=REGISTRY_PATH):
+    """
+    Load the feed registry
+
+    Each entry holds the feed url plus the metadata we can't reliably read from
+    the feed itself: country, language and polling priority.
+
+    Returns:
+        Dict of url -> feed entry, in registry order
+    """
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+
+    feeds = {}
+    for entry in entries:
+        if not entry.get("url"):
+            raise ValueError(f"Feed registry entry without a url: {entry}")
+        priority = entry.get("priority", "normal")
+        if priority not in PRIORITY_FACTORS:
+            raise ValueError(f"Unknown priority '{priority}' for {entry['url']}")
+        feeds[entry["url"]] = {
+            "url": entry["url"],
+            "country": entry.get("country") or "Unknown",
+            "language": entry.get("language"),
+            "priority": priority
+        }
+    return feeds
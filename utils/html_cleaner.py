@@ -0,0 +1,102 @@
+import re
+from html.entities import html5
+from html.parser import HTMLParser
+
+from bs4 import BeautifulSoup
+
+# BeautifulSoup only agrees with html.unescape on complete "&name;" entities:
+# it keeps "&nbsp" or "x&ampy" as written and mangles unknown ones ("&foo;"
+# becomes "&foo"), so leave any other "&" followed by a letter to it
+_NAMED_ENTITY = re.compile(r"&([A-Za-z][A-Za-z0-9]*;?)")
+
+# Tags whose content BeautifulSoup excludes from get_text(), plus CDATA
+# sections which it includes; rare in feed summaries, so not worth mirroring
+_FALLBACK_TAGS = {"script", "style", "template"}
+
+
+class _FallbackToSoup(Exception):
+    pass
+
+
+class _TextExtractor(HTMLParser):
+    """
+    Streaming text collector using the same tokenizer BeautifulSoup's
+    html.parser builder uses, minus the tree building
+
+    Text between two markup tokens forms one string, exactly like the
+    NavigableStrings get_text() walks over.
+    """
+
+    def __init__(self, separator, strip):
+        super().__init__(convert_charrefs=True)
+        self.separator = separator
+        self.strip = strip
+        self.parts = []
+        self._buffer = []
+
+    def flush(self):
+        if not self._buffer:
+            return
+        text = "".join(self._buffer)
+        self._buffer = []
+        if self.strip:
+            text = text.strip()
+            if not text:
+                return
+        self.parts.append(text)
+
+    def text(self):
+        self.flush()
+        return self.separator.join(self.parts)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _FALLBACK_TAGS:
+            raise _FallbackToSoup(tag)
+        self.flush()
+
+    def handle_endtag(self, tag):
+        self.flush()
+
+    def handle_data(self, data):
+        self._buffer.append(data)
+
+    def handle_comment(self, data):
+        self.flush()
+
+    def handle_decl(self, decl):
+        self.flush()
+
+    def handle_pi(self, data):
+        self.flush()
+
+    def unknown_decl(self, data):
+        raise _FallbackToSoup(data)
+
+
+def soup_text(raw_html, separator=" ", strip=True):
+    """Reference implementation, also used for input the fast path won't handle"""
+    return BeautifulSoup(raw_html, "html.parser").get_text(separator=separator, strip=strip)
+
+
+def clean_html(raw_html, separator=" ", strip=True):
+    """
+    Extract the text from an HTML fragment
+
+    Produces the same text as BeautifulSoup(raw_html, "html.parser")
+    .get_text(separator, strip) without building a parse tree, and falls back
+    to BeautifulSoup for markup the fast path doesn't mirror exactly.
+    """
+    if not raw_html:
+        return ""
+    if "<" not in raw_html and "&" not in raw_html:
+        return raw_html.strip() if strip else raw_html
+    if any(not match.group(1).endswith(";") or match.group(1) not in html5 for match in _NAMED_ENTITY.finditer(raw_html)):
+        return soup_text(raw_html, separator, strip)
+
+    parser = _TextExtractor(separator, strip)
+    try:
+        parser.feed(raw_html)
+        parser.close()
+    except Exception:
+        return soup_text(raw_html, separator, strip)
+    return parser.text()
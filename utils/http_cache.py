@@ -0,0 +1,82 @@
+import json
+import os
+import threading
+
+# -------------------------- CACHE CONFIG --------------------------
+CACHE_DIR = os.getenv("FEED_CACHE_DIR", "cache")
+
+
+def write_json_atomic(path, data):
+    """Write data as JSON via a temp file so a crash never leaves a half-written file"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def read_json(path, default):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+class ValidatorCache:
+    """
+    On-disk store of the ETag / Last-Modified validators each feed last sent
+
+    Each scraper keeps its own cache under name: a 304 only means "nothing new"
+    relative to what that scraper itself has already written. For the same
+    reason new validators are held back until commit() says the feed's
+    entries were stored. Safe to share between the fetch threads; call save()
+    once the run is done.
+    """
+
+    def __init__(self, name):
+        self.path = os.path.join(CACHE_DIR, f"feed_validators_{name}.json")
+        self._lock = threading.Lock()
+        self._validators = read_json(self.path, {})
+        self._pending = {}
+
+    def headers_for(self, url):
+        """Conditional request headers for url, empty if we have never seen it"""
+        with self._lock:
+            cached = self._validators.get(url, {})
+        headers = {}
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+        return headers
+
+    def update(self, url, response):
+        """Hold the validators from a successful 200 response until commit()"""
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        with self._lock:
+            self._pending[url] = {"etag": etag, "last_modified": last_modified} if etag or last_modified else None
+
+    def commit(self, urls=None):
+        """
+        Keep the held validators of urls (every feed by default) and drop the rest
+
+        Only commit a feed once all of its entries are stored: a dropped
+        validator makes the next run fetch the feed in full instead of
+        getting a 304 that would hide the entries that failed.
+        """
+        with self._lock:
+            for url, validators in self._pending.items():
+                if urls is not None and url not in urls:
+                    continue
+                if validators:
+                    self._validators[url] = validators
+                else:
+                    self._validators.pop(url, None)
+            self._pending.clear()
+
+    def save(self):
+        with self._lock:
+            snapshot = dict(self._validators)
+        write_json_atomic(self.path, snapshot)
@@ -0,0 +1,99 @@
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+    push_to_gateway,
+    start_http_server,
+    write_to_textfile,
+)
+
+# -------------------------- METRICS CONFIG --------------------------
+# One-shot runs leave their metrics behind in one of two ways: a .prom file for
+# node_exporter's textfile collector, or a push to a Prometheus Pushgateway.
+# Long-running processes are scraped instead (GET /metrics on the API, or
+# METRICS_PORT for the scheduler). With several API workers, set
+# PROMETHEUS_MULTIPROC_DIR so /metrics adds up every worker's samples
+METRICS_TEXTFILE = os.getenv("METRICS_TEXTFILE")
+METRICS_PUSHGATEWAY_URL = os.getenv("METRICS_PUSHGATEWAY_URL")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+MULTIPROCESS_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+# Seconds; spans a cached API response up to a slow feed behind retries
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def collecting_registry():
+    """The registry to expose: every worker's samples in multiprocess mode, else this process's"""
+    if not MULTIPROCESS_DIR:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render():
+    """Every metric in the Prometheus text exposition format"""
+    return generate_latest(collecting_registry())
+
+
+# -------------------------- EXPORT --------------------------
+def flush(job):
+    """
+    Export the metrics of a run wherever METRICS_TEXTFILE / METRICS_PUSHGATEWAY_URL say
+
+    Does nothing when neither is set. Failures are printed, never raised, so
+    metrics can't fail a scrape.
+    """
+    if METRICS_TEXTFILE:
+        try:
+            os.makedirs(os.path.dirname(METRICS_TEXTFILE) or ".", exist_ok=True)
+            write_to_textfile(METRICS_TEXTFILE, REGISTRY)
+        except OSError as e:
+            print(f"⚠️ Could not write metrics to {METRICS_TEXTFILE}: {e}")
+    if METRICS_PUSHGATEWAY_URL:
+        try:
+            push_to_gateway(METRICS_PUSHGATEWAY_URL, job=job, registry=REGISTRY, timeout=10)
+        except Exception as e:
+            print(f"⚠️ Could not push metrics to {METRICS_PUSHGATEWAY_URL}: {e}")
+
+
+def serve(port=METRICS_PORT, host="0.0.0.0"):
+    """Serve the metrics on a daemon thread for Prometheus to scrape"""
+    start_http_server(port, addr=host, registry=collecting_registry())
+
+
+# -------------------------- SCRAPER METRICS --------------------------
+# Shared by both RSS scrapers; feed is the feed url
+FEED_STAGES = ("fetch", "parse", "clean")
+
+feed_polls = Counter(
+    "scraper_feed_polls", "Feed polls by outcome (ok, not_modified, error, circuit_open)", ("feed", "outcome")
+)
+feed_articles = Counter(
+    "scraper_feed_articles", "Feed entries by what happened to them (new, seen)", ("feed", "status")
+)
+feed_bytes = Counter("scraper_feed_bytes", "Feed body bytes downloaded", ("feed",))
+feed_stage_seconds = Histogram(
+    "scraper_feed_stage_seconds", "Time one feed poll spent in each stage (fetch, parse, clean)", ("feed", "stage"),
+    buckets=DEFAULT_BUCKETS
+)
+upsert_batch_seconds = Histogram(
+    "scraper_upsert_batch_seconds", "Time to write one batch to storage", ("storage",), buckets=DEFAULT_BUCKETS
+)
+upserted_rows = Counter("scraper_upserted_rows", "Rows written by result (inserted, updated, failed)", ("result",))
+run_seconds = Histogram(
+    "scraper_run_seconds", "Wall time of a whole scrape run", ("scraper",),
+    buckets=(1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+)
+last_run_timestamp = Gauge(
+    "scraper_last_run_timestamp_seconds", "When the last scrape run finished", ("scraper",), multiprocess_mode="max"
+)
@@ -0,0 +1,321 @@
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from urllib.parse import unquote_plus, urlsplit, urlunsplit
+
+import numpy as np
+
+from utils.http_cache import CACHE_DIR
+
+# -------------------------- CANONICAL URLS --------------------------
+# Campaign and ad-click parameters that only say where a click came from; links
+# differing in nothing else are the same article. General names like ref or cmp
+# are left alone, since some sites route on them
+TRACKING_PARAM_PREFIXES = ("utm_",)
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid"}
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def _is_tracking_param(name):
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PARAM_PREFIXES)
+
+
+def canonical_url(url):
+    """
+    Normalise an article link so tracking variants of it compare equal
+
+    Lowercases the scheme and host, drops default ports, fragments and
+    tracking parameters (utm_*, fbclid, gclid, ...). The rest of the query is
+    kept exactly as sent, in its order and encoding. The result is still a
+    working link; anything that isn't an http(s) URL is returned stripped but
+    otherwise unchanged.
+    """
+    if not url:
+        return url
+    url = url.strip()
+    try:
+        parts = urlsplit(url)
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return url
+
+    netloc = parts.hostname.lower()
+    if port and port != DEFAULT_PORTS[scheme]:
+        netloc = f"{netloc}:{port}"
+    if parts.username:
+        netloc = f"{parts.username}{':' + parts.password if parts.password else ''}@{netloc}"
+    query = "&".join(
+        piece for piece in parts.query.split("&")
+        if not _is_tracking_param(unquote_plus(piece.split("=", 1)[0]).lower())
+    )
+    return urlunsplit((scheme, netloc, parts.path, query, ""))
+
+
+# -------------------------- NEAR-DUPLICATE INDEX --------------------------
+NEAR_DUPLICATE_INDEX_PATH = os.getenv("NEAR_DUPLICATE_INDEX_PATH", os.path.join(CACHE_DIR, "near_duplicates.sqlite3"))
+
+# Two articles are near-duplicates when the Jaccard similarity of their word
+# features, estimated from NUM_HASHES MinHash values, reaches SIMILARITY.
+# Signatures are cut into BANDS bands of ROWS values; only articles agreeing
+# on a whole band are compared, which catches pairs at 0.8 >99.9% of the time
+# and pairs at 0.3 ~12% of the time
+SIMILARITY = float(os.getenv("NEAR_DUPLICATE_SIMILARITY", "0.8"))
+NUM_HASHES = 64
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+# Shorter texts don't carry enough signal to tell stories apart
+MIN_FEATURES = 6
+# Cap on candidates compared per article, in case a band is very common
+MAX_CANDIDATES = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS near_dup_articles (
+    guid TEXT PRIMARY KEY,
+    signature BLOB,
+    cluster TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS near_dup_cluster_idx ON near_dup_articles (cluster);
+CREATE TABLE IF NOT EXISTS near_dup_bands (
+    band_key INTEGER NOT NULL,
+    guid TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS near_dup_band_key_idx ON near_dup_bands (band_key);
+"""
+
+
+def _seeded_uint64(label):
+    return int.from_bytes(hashlib.blake2b(label.encode(), digest_size=8).digest(), "little")
+
+
+# Multiply-shift hash family: h_i(x) = (a_i * x + b_i mod 2^64) >> 32, a_i odd.
+# Derived from fixed labels so signatures stay comparable across runs
+HASH_MULTIPLIERS = np.array([_seeded_uint64(f"minhash-a-{i}") | 1 for i in range(NUM_HASHES)], dtype=np.uint64)
+HASH_OFFSETS = np.array([_seeded_uint64(f"minhash-b-{i}") for i in range(NUM_HASHES)], dtype=np.uint64)
+
+
+def article_features(title, summary):
+    """Distinct word unigrams and bigrams of the title and summary, lowercased"""
+    words = re.findall(r"\w+", f"{title or ''} {summary or ''}".lower())
+    return set(words) | {f"{first} {second}" for first, second in zip(words, words[1:])}
+
+
+def minhash_signature(features):
+    """
+    NUM_HASHES-value MinHash signature of a feature set, or None if it is too small
+
+    The share of positions where two signatures agree estimates the Jaccard
+    similarity of the two feature sets.
+    """
+    if len(features) < MIN_FEATURES:
+        return None
+    values = np.frombuffer(
+        b"".join(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest() for feature in features), dtype="<u8"
+    )
+    with np.errstate(over="ignore"):
+        hashed = (values[:, None] * HASH_MULTIPLIERS + HASH_OFFSETS) >> np.uint64(32)
+    return hashed.min(axis=0).astype("<u4")
+
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.mean(first == second))
+
+
+def band_keys(signature):
+    # One 63-bit key per band (SQLite integers are signed)
+    data = signature.tobytes()
+    width = ROWS * 4
+    return [
+        int.from_bytes(hashlib.blake2b(bytes([band]) + data[band * width:(band + 1) * width], digest_size=8).digest(),
+                       "little") >> 1
+        for band in range(BANDS)
+    ]
+
+
+class NearDuplicateIndex:
+    """
+    MinHash LSH index that groups the same story across sources into clusters
+
+    Each article gets a MinHash signature of its title and summary. A new
+    article joins the cluster of its most similar indexed article at or above
+    SIMILARITY, or starts its own cluster named after its guid. Candidates come from indexed
+    band lookups, so the cost per article tracks the number of candidates
+    rather than the size of the index. Safe to share between threads.
+    """
+
+    def __init__(self, path=NEAR_DUPLICATE_INDEX_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def _closest(self, signature, keys, exclude=None):
+        # (cluster, similarity) of the most similar indexed article, or None
+        candidates = self._conn.execute(
+            "SELECT a.guid, a.signature, a.cluster FROM near_dup_articles a WHERE a.guid IN ("
+            f"SELECT DISTINCT guid FROM near_dup_bands WHERE band_key IN ({', '.join('?' for _ in keys)}) LIMIT ?)",
+            keys + [MAX_CANDIDATES]
+        ).fetchall()
+        best = None
+        for guid, other, cluster in candidates:
+            if guid == exclude:
+                continue
+            score = similarity(signature, np.frombuffer(other, dtype="<u4"))
+            if score >= SIMILARITY and (best is None or score > best[1]):
+                best = (cluster, score)
+        return best
+
+    def match(self, articles):
+        """
+        Clusters already in the index that articles would join, without adding them
+
+        Args:
+            articles: Dicts with guid, title and summary
+
+        Returns:
+            {guid: cluster} for the articles that near-duplicate an indexed
+            article other than themselves
+        """
+        matches = {}
+        with self._lock:
+            for article in articles:
+                signature = minhash_signature(article_features(article.get("title"), article.get("summary")))
+                if signature is None or not article.get("guid"):
+                    continue
+                closest = self._closest(signature, band_keys(signature), exclude=article["guid"])
+                if closest is not None:
+                    matches[article["guid"]] = closest[0]
+        return matches
+
+    def add(self, articles):
+        """
+        Index articles and assign each to a cluster; rows without a guid are skipped
+
+        An article that is already indexed keeps its cluster.
+
+        Args:
+            articles: Dicts with guid, title and summary, in the order they were stored
+
+        Returns:
+            {guid: cluster} for every indexed article
+        """
+        clusters = {}
+        with self._lock, self._conn:
+            for article in articles:
+                guid = article.get("guid")
+                if not guid:
+                    continue
+                existing = self._conn.execute("SELECT cluster FROM near_dup_articles WHERE guid = ?", (guid,)).fetchone()
+                if existing:
+                    clusters[guid] = existing[0]
+                    continue
+                signature = minhash_signature(article_features(article.get("title"), article.get("summary")))
+                cluster = guid
+                if signature is not None:
+                    keys = band_keys(signature)
+                    closest = self._closest(signature, keys)
+                    if closest is not None:
+                        cluster = closest[0]
+                    self._conn.executemany("INSERT INTO near_dup_bands (band_key, guid) VALUES (?, ?)",
+                                           [(key, guid) for key in keys])
+                self._conn.execute(
+                    "INSERT INTO near_dup_articles (guid, signature, cluster) VALUES (?, ?, ?)",
+                    (guid, signature.tobytes() if signature is not None else None, cluster)
+                )
+                clusters[guid] = cluster
+        return clusters
+
+    def clusters_of(self, guids):
+        """{guid: cluster} for the guids that are indexed"""
+        guids = list(guids)
+        found = {}
+        with self._lock:
+            for i in range(0, len(guids), 900):
+                chunk = guids[i:i + 900]
+                found.update(self._conn.execute(
+                    f"SELECT guid, cluster FROM near_dup_articles WHERE guid IN ({', '.join('?' for _ in chunk)})", chunk
+                ).fetchall())
+        return found
+
+    def members_of(self, clusters):
+        """{cluster: [guid, ...]} for clusters with more than one indexed article"""
+        clusters = list(set(clusters))
+        members = {}
+        with self._lock:
+            for i in range(0, len(clusters), 900):
+                chunk = clusters[i:i + 900]
+                for guid, cluster in self._conn.execute(
+                    f"SELECT guid, cluster FROM near_dup_articles WHERE cluster IN ({', '.join('?' for _ in chunk)})", chunk
+                ):
+                    members.setdefault(cluster, []).append(guid)
+        return {cluster: guids for cluster, guids in members.items() if len(guids) > 1}
+
+    def stats(self):
+        with self._lock:
+            articles, clusters = self._conn.execute(
+                "SELECT count(*), count(DISTINCT cluster) FROM near_dup_articles"
+            ).fetchone()
+            largest = self._conn.execute(
+                "SELECT cluster, count(*) AS size FROM near_dup_articles GROUP BY cluster "
+                "HAVING size > 1 ORDER BY size DESC LIMIT 10"
+            ).fetchall()
+        return {"articles": articles, "clusters": clusters, "largest": largest}
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM near_dup_articles")
+            self._conn.execute("DELETE FROM near_dup_bands")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def backfill_from_storage(index, page_size=1000):
+    """Cluster every row already in the configured news_feed storage, oldest first"""
+    from utils.storage import create_storage
+
+    storage = create_storage()
+    last_id = 0
+    indexed = 0
+    while True:
+        rows = storage.rows_after_id(last_id, page_size, ("guid", "title", "summary"))
+        if not rows:
+            break
+        indexed += len(index.add(rows))
+        last_id = rows[-1]["id"]
+        print(f"📥 Clustered {indexed} articles")
+    return indexed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Near-duplicate article clusters")
+    commands = parser.add_subparsers(dest="command", required=True)
+    backfill_parser = commands.add_parser("backfill", help="cluster the articles already in storage (STORAGE_BACKEND)")
+    backfill_parser.add_argument("--rebuild", action="store_true", help="forget existing clusters first")
+    commands.add_parser("stats", help="print cluster counts and the largest clusters")
+    url_parser = commands.add_parser("canonical-url", help="print the canonical form of a link")
+    url_parser.add_argument("url")
+    args = parser.parse_args()
+
+    if args.command == "canonical-url":
+        print(canonical_url(args.url))
+    else:
+        near_duplicates = NearDuplicateIndex()
+        if args.command == "backfill":
+            if args.rebuild:
+                near_duplicates.clear()
+            print(f"✅ Clustered {backfill_from_storage(near_duplicates)} articles")
+        stats = near_duplicates.stats()
+        print(f"📊 {stats['articles']} articles in {stats['clusters']} clusters")
+        for cluster, size in stats["largest"]:
+            print(f"   {size} × {cluster}")
@@ -0,0 +1,208 @@
+import argparse
+import glob
+import os
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+# -------------------------- STORE CONFIG --------------------------
+STORE_DIR = os.getenv("PARQUET_STORE_DIR", "data_store")
+PARTITION_COLUMNS = ["Country", "Published Month"]
+
+# CSV / XLSX views the scrapers write after each run, e.g. SCRAPER_EXPORTS=csv,xlsx
+EXPORT_FORMATS = {fmt.strip().lower() for fmt in os.getenv("SCRAPER_EXPORTS", "").split(",") if fmt.strip()}
+
+SCRAPED_SCHEMA = pa.schema([
+    ("Title", pa.string()),
+    ("Publication Date", pa.string()),
+    ("Source", pa.string()),
+    ("News URL", pa.string()),
+    ("Summary", pa.string()),
+    ("Author", pa.string()),
+    ("Category", pa.string()),
+    ("GUID", pa.string()),
+    ("Image URL", pa.string()),
+    ("Language", pa.string()),
+    ("Scraped Timestamp", pa.timestamp("us")),
+    ("Country", pa.string()),
+    ("Published Month", pa.string())
+])
+
+HISTORICAL_SCHEMA = pa.schema([
+    ("Title", pa.string()),
+    ("Link", pa.string()),
+    ("Published", pa.string()),
+    ("Summary", pa.string()),
+    ("Source", pa.string()),
+    ("Author", pa.string()),
+    ("Publisher Domain", pa.string()),
+    ("Sentiment Score", pa.float64()),
+    ("Scraped Time", pa.timestamp("us")),
+    ("Country", pa.string()),
+    ("Published Month", pa.string())
+])
+
+# dataset name -> (schema, raw publication column, scrape time column)
+DATASETS = {
+    "rss_scraped": (SCRAPED_SCHEMA, "Publication Date", "Scraped Timestamp"),
+    "historical": (HISTORICAL_SCHEMA, "Published", "Scraped Time")
+}
+
+
+def _published_month(published, scraped):
+    # Feeds send RFC 822 dates with assorted offsets; rows without a parseable
+    # one are filed under the month they were scraped. Months rather than days
+    # keep files large enough for Parquet to pay off at a few hundred rows a day
+    parsed = pd.to_datetime(published, utc=True, errors="coerce", format="mixed").dt.strftime("%Y-%m")
+    fallback = pd.to_datetime(scraped, errors="coerce", format="mixed").dt.strftime("%Y-%m")
+    return parsed.fillna(fallback).fillna("unknown")
+
+
+def to_table(df, dataset):
+    """Type a DataFrame with the dataset's schema and derive its partition columns"""
+    schema, published_column, scraped_column = DATASETS[dataset]
+    df = df.copy()
+    df[scraped_column] = pd.to_datetime(df[scraped_column], errors="coerce", format="mixed")
+    df["Published Month"] = _published_month(df[published_column], df[scraped_column])
+    df["Country"] = df["Country"].fillna("Unknown")
+    return pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False)
+
+
+def append(df, dataset, replace_partitions=False):
+    """
+    Write rows as new zstd-compressed Parquet files under the dataset's
+    Country=/Published Month= partitions
+
+    Args:
+        df: Rows to store, with the dataset's columns
+        dataset: Dataset name in DATASETS
+        replace_partitions: Delete what the touched partitions held before
+            (for full re-fetches); by default files are only ever added
+
+    Returns:
+        Number of rows written
+    """
+    if df.empty:
+        return 0
+    ds.write_dataset(
+        to_table(df, dataset),
+        base_dir=os.path.join(STORE_DIR, dataset),
+        format="parquet",
+        partitioning=PARTITION_COLUMNS,
+        partitioning_flavor="hive",
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior="delete_matching" if replace_partitions else "overwrite_or_ignore",
+        file_options=ds.ParquetFileFormat().make_write_options(compression="zstd")
+    )
+    return len(df)
+
+
+def published_months(df, dataset):
+    """The "YYYY-MM" Published Month partition each row would be stored under"""
+    _, published_column, scraped_column = DATASETS[dataset]
+    scraped = pd.to_datetime(df[scraped_column], errors="coerce", format="mixed")
+    return _published_month(df[published_column], scraped)
+
+
+def replace_months(df, dataset, country, months):
+    """
+    Store rows for a country, making them the whole content of its months partitions
+
+    The new files are written before the old files of those months are
+    removed, so readers never see a month go missing; rows in other months are
+    only added. A month in months with no rows in df ends up empty.
+
+    Args:
+        df: Rows to store, with the dataset's columns, all for country
+        dataset: Dataset name in DATASETS
+        country: Value of the Country partition
+        months: "YYYY-MM" months df holds every row of
+
+    Returns:
+        Number of rows written
+    """
+    path = os.path.join(STORE_DIR, dataset)
+    previous = []
+    if months and os.path.isdir(path):
+        stored = ds.dataset(path, format="parquet", partitioning="hive", schema=DATASETS[dataset][0])
+        expression = (ds.field("Country") == country) & ds.field("Published Month").isin(sorted(months))
+        previous = [fragment.path for fragment in stored.get_fragments(filter=expression)]
+
+    written = append(df, dataset)
+    for file_path in previous:
+        os.remove(file_path)
+        try:
+            os.rmdir(os.path.dirname(file_path))
+        except OSError:
+            pass  # the month still holds the new files
+    return written
+
+
+def read(dataset, filter=None, columns=None):
+    """
+    Read a dataset back as a DataFrame
+
+    Args:
+        dataset: Dataset name in DATASETS
+        filter: Optional pyarrow expression, e.g. ds.field("Country") == "India";
+            filters on partition columns only open the matching directories
+        columns: Optional subset of columns to load
+    """
+    schema = DATASETS[dataset][0]
+    path = os.path.join(STORE_DIR, dataset)
+    if not os.path.isdir(path):
+        return pd.DataFrame(columns=columns or schema.names)
+    dataset = ds.dataset(path, format="parquet", partitioning="hive", schema=schema)
+    return dataset.to_table(filter=filter, columns=columns).to_pandas()
+
+
+def export(df, csv_path=None, xlsx_path=None):
+    """Write the on-demand CSV / XLSX views of stored rows"""
+    for path in (csv_path, xlsx_path):
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+    if csv_path:
+        df.to_csv(csv_path, index=False, encoding="utf-8")
+    if xlsx_path:
+        df.to_excel(xlsx_path, index=False, engine="openpyxl")
+
+
+def backfill_from_csv():
+    """Load the CSV outputs written before the store existed"""
+    legacy_csv = "rss_scraped_data/csv/rss_scraped_data_output.csv"
+    if os.path.exists(legacy_csv):
+        df = pd.read_csv(legacy_csv, dtype=str, keep_default_na=False, na_values=[""])
+        # Older files hold "<field> Not Found" placeholders instead of empty cells
+        sentinels = {column: {f"{column} Not Found": None} for column in df.columns}
+        sentinels["News URL"] = {"URL Not Found": None}
+        df = df.replace(sentinels)
+        print(f"📥 rss_scraped: {append(df, 'rss_scraped', replace_partitions=True)} rows from {legacy_csv}")
+
+    countries = {"india": "India", "china": "China", "usa": "United States", "singapore": "Singapore"}
+    for path in sorted(glob.glob("historical_data/csv/historical_data_*.csv")):
+        country_code = os.path.basename(path)[len("historical_data_"):-len(".csv")]
+        df = pd.read_csv(path, keep_default_na=False, na_values=[""])
+        df["Country"] = countries.get(country_code, country_code)
+        print(f"📥 historical: {append(df, 'historical', replace_partitions=True)} rows from {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parquet article store maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("backfill", help="import the existing CSV outputs into the store")
+    export_parser = commands.add_parser("export", help="write a dataset out as CSV and/or XLSX")
+    export_parser.add_argument("dataset", choices=sorted(DATASETS))
+    export_parser.add_argument("--country", help="only export this country's partitions")
+    export_parser.add_argument("--csv", dest="csv_path")
+    export_parser.add_argument("--xlsx", dest="xlsx_path")
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        backfill_from_csv()
+    else:
+        row_filter = ds.field("Country") == args.country if args.country else None
+        rows = read(args.dataset, filter=row_filter).drop(columns=["Published Month"])
+        export(rows, args.csv_path, args.xlsx_path)
+        print(f"✅ Exported {len(rows)} rows")
@@ -0,0 +1,90 @@
+import os
+import time
+
+from utils.feed_registry import PRIORITY_FACTORS
+from utils.http_cache import CACHE_DIR, read_json, write_json_atomic
+
+# -------------------------- SCHEDULE CONFIG --------------------------
+SCHEDULE_PATH = os.path.join(CACHE_DIR, "poll_schedule.json")
+MIN_INTERVAL_MINUTES = float(os.getenv("POLL_MIN_INTERVAL_MINUTES", "5"))
+MAX_INTERVAL_MINUTES = float(os.getenv("POLL_MAX_INTERVAL_MINUTES", "360"))
+DEFAULT_INTERVAL_MINUTES = 30.0
+RETRY_INTERVAL_MINUTES = float(os.getenv("POLL_RETRY_INTERVAL_MINUTES", "15"))
+TARGET_NEW_PER_POLL = 5.0  # poll often enough to pick up about this many new articles each time
+RATE_SMOOTHING = 0.3  # weight of the latest observation in the publish-rate average
+
+
+class PollSchedule:
+    """
+    Per-feed polling intervals learned from how often each feed publishes
+
+    Every poll records how many new articles the feed had since the previous
+    poll. An exponential moving average of that rate sets the next interval,
+    so busy feeds are polled often and quiet ones rarely, scaled by the feed's
+    registry priority. State is kept on disk so a restart keeps what it learned.
+    """
+
+    def __init__(self, feeds, path=SCHEDULE_PATH):
+        self.path = path
+        self.feeds = feeds
+        saved = read_json(path, {})
+        self._state = {url: saved.get(url, {}) for url in feeds}
+
+    def due_feeds(self, now=None):
+        now = now or time.time()
+        return [url for url, state in self._state.items() if state.get("next_poll", 0) <= now]
+
+    def seconds_until_next_poll(self, now=None):
+        now = now or time.time()
+        next_poll = min(state.get("next_poll", 0) for state in self._state.values())
+        return max(0.0, next_poll - now)
+
+    def interval_minutes(self, url):
+        rate = self._state[url].get("rate_per_hour")
+        if rate is None:
+            minutes = DEFAULT_INTERVAL_MINUTES
+        elif rate <= 0:
+            minutes = MAX_INTERVAL_MINUTES
+        else:
+            minutes = TARGET_NEW_PER_POLL / rate * 60
+        minutes *= PRIORITY_FACTORS[self.feeds[url]["priority"]]
+        return min(MAX_INTERVAL_MINUTES, max(MIN_INTERVAL_MINUTES, minutes))
+
+    def record_polls(self, new_articles, completed=None, now=None):
+        """
+        Update each polled feed's publish rate and next poll time
+
+        Args:
+            new_articles: Number of new articles per polled feed url
+            completed: Urls whose poll completed (200 or 304); the others failed
+                or were skipped, so their 0 says nothing about the publish rate
+                and they are retried after RETRY_INTERVAL_MINUTES. Defaults to all
+            now: Poll time (epoch seconds), defaults to now
+        """
+        now = now or time.time()
+        for url, new_count in new_articles.items():
+            state = self._state[url]
+            if completed is not None and url not in completed:
+                state["interval_minutes"] = RETRY_INTERVAL_MINUTES
+                state["next_poll"] = now + RETRY_INTERVAL_MINUTES * 60
+                continue
+            last_poll = state.get("last_poll")
+            # The first poll only returns the feed's backlog, which says nothing about its rate
+            if last_poll is not None:
+                hours = max((now - last_poll) / 3600, 1 / 60)
+                observed = new_count / hours
+                rate = state.get("rate_per_hour")
+                state["rate_per_hour"] = observed if rate is None else RATE_SMOOTHING * observed + (1 - RATE_SMOOTHING) * rate
+
+            interval = self.interval_minutes(url)
+            state["last_poll"] = now
+            state["last_new_articles"] = new_count
+            state["interval_minutes"] = round(interval, 1)
+            state["next_poll"] = now + interval * 60
+
+    def next_poll_minutes(self, url):
+        """Minutes from the last recorded poll to the feed's next one"""
+        return self._state[url].get("interval_minutes", self.interval_minutes(url))
+
+    def save(self):
+        write_json_atomic(self.path, self._state)
@@ -0,0 +1,92 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+# Multiplicative decrease on throttling, additive increase on success (AIMD):
+# one 429 halves the rate, it then takes ~20 clean responses to climb back
+BACKOFF_FACTOR = 0.5
+RECOVERY_STEP = 0.05  # fraction of the configured rate regained per success
+MIN_RATE_FRACTION = 1 / 16
+
+
+def retry_after_seconds(response):
+    """Seconds a 429/503 response asks us to wait, from Retry-After, or None"""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket shared by every worker thread, with adaptive backoff
+
+    acquire() blocks until a request may be sent, so the whole run stays under
+    rate requests per second however many workers there are. throttled() halves
+    the rate and pauses everyone (for Retry-After when the server sends one);
+    succeeded() gradually restores it.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.max_rate = rate
+        self.min_rate = rate * MIN_RATE_FRACTION
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "throttled": 0, "waited_seconds": 0.0}
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def acquire(self):
+        """Block until the bucket has a token, then take it"""
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    self.stats["requests"] += 1
+                    self.stats["waited_seconds"] += now - started
+                    return
+                else:
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def throttled(self, retry_after=None):
+        """
+        Back off after a 429 or 5xx
+
+        Args:
+            retry_after: Seconds the server asked for; defaults to one interval
+                at the reduced rate
+        """
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * BACKOFF_FACTOR)
+            pause = retry_after if retry_after is not None else 1 / self.rate
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            self._tokens = 0.0
+            self.stats["throttled"] += 1
+
+    def succeeded(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * RECOVERY_STEP)
+
+    def report(self):
+        with self._lock:
+            return {**self.stats, "waited_seconds": round(self.stats["waited_seconds"], 1), "rate": round(self.rate, 3)}
@@ -0,0 +1,72 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+# -------------------------- CACHE CONFIG --------------------------
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+
+CachedResponse = namedtuple("CachedResponse", ["body", "etag", "stored_at"])
+
+
+class ResponseCache:
+    """
+    In-process LRU cache of rendered response bodies with a TTL
+
+    Entries are keyed by request path plus query string and expire after
+    ttl_seconds, or all at once when invalidate() is called after new data lands.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, ttl_seconds=RESPONSE_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def key_for(path, query_params):
+        """Cache key that doesn't depend on the order query parameters were sent in"""
+        return path + "?" + "&".join(f"{name}={value}" for name, value in sorted(query_params.multi_items()))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.stored_at < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return entry
+            if entry is not None:
+                del self._entries[key]
+            self._counters["misses"] += 1
+            return None
+
+    def set(self, key, body, etag_body=None):
+        """Store body under key; its ETag hashes etag_body when given (body minus volatile parts), else body"""
+        etag = f'"{hashlib.blake2b(body if etag_body is None else etag_body, digest_size=12).hexdigest()}"'
+        entry = CachedResponse(body, etag, time.monotonic())
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+        return entry
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._counters["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hit_ratio": round(self._counters["hits"] / lookups, 3) if lookups else None
+            }
@@ -0,0 +1,206 @@
+import argparse
+import os
+import re
+import sqlite3
+import threading
+
+from utils.http_cache import CACHE_DIR
+
+# -------------------------- INDEX CONFIG --------------------------
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", os.path.join(CACHE_DIR, "search_index.sqlite3"))
+
+# bm25 column weights: a hit in the title counts for more than one in the
+# category, which counts for more than one buried in the summary
+RANK_WEIGHTS = {"title": 10.0, "summary": 1.0, "category": 4.0}
+
+FILTER_COLUMNS = ("category", "source", "country", "language", "author")
+STORED_COLUMNS = ("guid", "title", "summary", "category", "source", "country", "language", "author", "scraped_timestamp")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_articles (
+    id INTEGER PRIMARY KEY,
+    guid TEXT NOT NULL UNIQUE,
+    title TEXT,
+    summary TEXT,
+    category TEXT,
+    source TEXT,
+    country TEXT,
+    language TEXT,
+    author TEXT,
+    scraped_timestamp TEXT
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+    title, summary, category,
+    content='search_articles', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3 4'
+);
+CREATE TRIGGER IF NOT EXISTS search_articles_ai AFTER INSERT ON search_articles BEGIN
+    INSERT INTO search_fts(rowid, title, summary, category) VALUES (new.id, new.title, new.summary, new.category);
+END;
+CREATE TRIGGER IF NOT EXISTS search_articles_ad AFTER DELETE ON search_articles BEGIN
+    INSERT INTO search_fts(search_fts, rowid, title, summary, category) VALUES ('delete', old.id, old.title, old.summary, old.category);
+END;
+CREATE TRIGGER IF NOT EXISTS search_articles_au AFTER UPDATE ON search_articles BEGIN
+    INSERT INTO search_fts(search_fts, rowid, title, summary, category) VALUES ('delete', old.id, old.title, old.summary, old.category);
+    INSERT INTO search_fts(rowid, title, summary, category) VALUES (new.id, new.title, new.summary, new.category);
+END;
+"""
+
+
+def build_match_query(text):
+    """
+    Turn free text into an FTS5 query: every word must match, as a prefix
+
+    Words are quoted so FTS5 operators typed by users (AND, NEAR, "*", ...)
+    are searched for literally instead of raising syntax errors.
+
+    Returns:
+        The MATCH expression, or None if text has no searchable words
+    """
+    terms = re.findall(r"\w+", text or "")
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+class SearchIndex:
+    """
+    SQLite FTS5 index over article title, summary and category
+
+    The database scraper adds every batch it upserts, keyed by guid, and the
+    API ranks matches here with bm25 before loading the full rows from
+    storage. Lookups walk the inverted index, so their cost tracks the number
+    of matches rather than the size of the table. Safe to share between threads.
+    """
+
+    def __init__(self, path=SEARCH_INDEX_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            # WAL lets the API keep searching while a scrape writes
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def add(self, articles):
+        """
+        Index or re-index articles by guid; rows without a guid are skipped
+
+        Args:
+            articles: Dicts with the news_feed column names
+
+        Returns:
+            Number of articles indexed
+        """
+        rows = [tuple(article.get(column) for column in STORED_COLUMNS) for article in articles if article.get("guid")]
+        updates = ", ".join(f"{column} = excluded.{column}" for column in STORED_COLUMNS[1:])
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO search_articles ({', '.join(STORED_COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in STORED_COLUMNS)}) "
+                f"ON CONFLICT(guid) DO UPDATE SET {updates}",
+                rows
+            )
+        return len(rows)
+
+    def search(self, text, filters=None, limit=100, offset=0, count=True):
+        """
+        Rank articles matching text, best match first
+
+        Args:
+            text: Free-text query; every word must match title, summary or
+                category, and words match as prefixes ("elect" finds "election")
+            filters: Optional exact-match filters on category, source, country,
+                language and author, plus search_title (substring of the title)
+            limit: Maximum number of guids to return
+            offset: Number of ranked matches to skip
+            count: Whether to also count every match
+
+        Returns:
+            Tuple of (guids, total); total is None when count is False
+        """
+        match = build_match_query(text)
+        if match is None:
+            return [], 0 if count else None
+
+        clauses = ["search_fts MATCH ?"]
+        params = [match]
+        filters = filters or {}
+        for column in FILTER_COLUMNS:
+            if filters.get(column):
+                clauses.append(f"a.{column} = ?")
+                params.append(filters[column])
+        if filters.get("search_title"):
+            clauses.append("a.title LIKE ?")
+            params.append(f"%{filters['search_title']}%")
+        where = " AND ".join(clauses)
+        weights = ", ".join(str(weight) for weight in RANK_WEIGHTS.values())
+
+        with self._lock:
+            guids = [row[0] for row in self._conn.execute(
+                f"SELECT a.guid FROM search_fts JOIN search_articles a ON a.id = search_fts.rowid "
+                f"WHERE {where} ORDER BY bm25(search_fts, {weights}), a.scraped_timestamp DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            )]
+            total = None
+            if count:
+                total = self._conn.execute(
+                    f"SELECT count(*) FROM search_fts JOIN search_articles a ON a.id = search_fts.rowid WHERE {where}",
+                    params
+                ).fetchone()[0]
+        return guids, total
+
+    def size(self):
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM search_articles").fetchone()[0]
+
+    def optimize(self):
+        """Merge the FTS segments written by many small batches into one"""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT INTO search_fts(search_fts) VALUES ('optimize')")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def backfill_from_storage(index, page_size=1000):
+    """Index every row already in the configured news_feed storage, paging by id"""
+    from utils.storage import create_storage
+
+    storage = create_storage()
+    last_id = 0
+    indexed = 0
+    while True:
+        rows = storage.rows_after_id(last_id, page_size, STORED_COLUMNS)
+        if not rows:
+            break
+        indexed += index.add(rows)
+        last_id = rows[-1]["id"]
+        print(f"📥 Indexed {indexed} articles")
+    index.optimize()
+    return indexed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Full-text search index maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("backfill", help="index the articles already in storage (STORAGE_BACKEND)")
+    commands.add_parser("optimize", help="merge index segments after many small writes")
+    query_parser = commands.add_parser("query", help="run a search against the index")
+    query_parser.add_argument("text")
+    query_parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    search_index = SearchIndex()
+    if args.command == "backfill":
+        print(f"✅ Indexed {backfill_from_storage(search_index)} articles")
+    elif args.command == "optimize":
+        search_index.optimize()
+        print(f"✅ Optimized index of {search_index.size()} articles")
+    else:
+        guids, total = search_index.search(args.text, limit=args.limit)
+        print(f"🔎 {total} matches")
+        for guid in guids:
+            print(f"   → {guid}")
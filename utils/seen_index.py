@@ -0,0 +1,63 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+from utils.http_cache import CACHE_DIR
+
+# -------------------------- INDEX CONFIG --------------------------
+SEEN_RETENTION_DAYS = int(os.getenv("SEEN_RETENTION_DAYS", "90"))
+
+
+def article_key(guid, link):
+    """Identity used for cross-run dedup: the feed's guid, else the article link"""
+    return (guid or "").strip() or (link or "").strip()
+
+
+class SeenIndex:
+    """
+    Persistent set of articles already written by a previous run
+
+    Backed by a single SQLite table so lookups stay O(log n) on disk without
+    loading the whole history into memory. Like ValidatorCache, each scraper
+    keeps its own index under name. Safe to share between fetch threads.
+    """
+
+    def __init__(self, name):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path = os.path.join(CACHE_DIR, f"seen_articles_{name}.sqlite3")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS seen_articles ("
+                "article_key TEXT PRIMARY KEY, first_seen TEXT NOT NULL)"
+            )
+
+    def contains(self, key):
+        if not key:
+            return False
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM seen_articles WHERE article_key = ?", (key,)
+            ).fetchone()
+        return row is not None
+
+    def mark_seen(self, keys):
+        """Record keys once their articles have been written successfully"""
+        now = datetime.utcnow().isoformat()
+        rows = [(key, now) for key in keys if key]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO seen_articles (article_key, first_seen) VALUES (?, ?)", rows
+            )
+
+    def prune(self, retention_days=SEEN_RETENTION_DAYS):
+        """Forget keys older than any feed still carries, so the index stays small"""
+        cutoff = (datetime.utcnow() - timedelta(days=retention_days)).isoformat()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM seen_articles WHERE first_seen < ?", (cutoff,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
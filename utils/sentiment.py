@@ -0,0 +1,162 @@
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pyarrow.dataset as ds
+
+from utils.http_cache import CACHE_DIR
+
+# -------------------------- SENTIMENT CONFIG --------------------------
+SENTIMENT_CACHE_PATH = os.getenv("SENTIMENT_CACHE_PATH", os.path.join(CACHE_DIR, "sentiment_cache.sqlite3"))
+SENTIMENT_WORKERS = int(os.getenv("SENTIMENT_WORKERS", str(os.cpu_count() or 1)))
+SENTIMENT_BATCH_SIZE = int(os.getenv("SENTIMENT_BATCH_SIZE", "500"))
+
+# Part of every cache key, so changing how scores are computed never serves
+# scores computed the old way
+SCORER = "textblob-polarity-3dp"
+
+
+def text_hash(text):
+    """Cache key for a text: SHA-1 of the scorer name and the UTF-8 text"""
+    return hashlib.sha1(f"{SCORER}\0{text or ''}".encode("utf-8")).hexdigest()
+
+
+def _score_batch(texts):
+    # Runs in a worker process; TextBlob is imported there, once per process
+    from textblob import TextBlob
+    return [round(TextBlob(text).sentiment.polarity, 3) if text else 0.0 for text in texts]
+
+
+class SentimentCache:
+    """
+    Persistent text hash -> polarity map
+
+    Google News repeats the same summary across queries and windows, and a
+    re-run sees mostly summaries it has already scored; both are served from
+    here instead of going through TextBlob again. Safe to share between threads.
+    """
+
+    def __init__(self, path=SENTIMENT_CACHE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS sentiment_scores (text_hash TEXT PRIMARY KEY, score REAL NOT NULL)")
+
+    def get_many(self, hashes):
+        """Cached scores for the hashes that have one, as {hash: score}"""
+        hashes = list(hashes)
+        found = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for i in range(0, len(hashes), 900):
+                chunk = hashes[i:i + 900]
+                found.update(self._conn.execute(
+                    f"SELECT text_hash, score FROM sentiment_scores WHERE text_hash IN ({', '.join('?' for _ in chunk)})",
+                    chunk
+                ).fetchall())
+        return found
+
+    def put_many(self, scores):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO sentiment_scores (text_hash, score) VALUES (?, ?)", list(scores.items())
+            )
+
+    def size(self):
+        with self._lock:
+            return self._conn.execute("SELECT count(*) FROM sentiment_scores").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def score_texts(texts, cache=None, workers=SENTIMENT_WORKERS, batch_size=SENTIMENT_BATCH_SIZE):
+    """
+    TextBlob polarity (rounded to 3 places) for every text
+
+    Each distinct text is scored once: repeats within texts and texts already
+    in the cache are looked up, and the rest are scored in batches across a
+    process pool (inline when there is only one batch or one worker).
+
+    Args:
+        texts: Iterable of strings (None and "" score 0.0)
+        cache: Optional SentimentCache to read from and add new scores to
+        workers: Worker processes
+        batch_size: Texts per task sent to a worker
+
+    Returns:
+        Tuple of (scores aligned with texts, stats dict with texts, unique,
+        cached and scored counts)
+    """
+    texts = [text or "" for text in texts]
+    hashes = [text_hash(text) for text in texts]
+    unique = dict(zip(hashes, texts))
+    scores = cache.get_many(unique) if cache is not None else {}
+
+    missing = [(key, text) for key, text in unique.items() if key not in scores]
+    batches = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+    texts_by_batch = [[text for _, text in batch] for batch in batches]
+    if workers > 1 and len(batches) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(batches))) as executor:
+            results = list(executor.map(_score_batch, texts_by_batch))
+    else:
+        results = [_score_batch(batch) for batch in texts_by_batch]
+
+    new_scores = {key: score for batch, batch_scores in zip(batches, results) for (key, _), score in zip(batch, batch_scores)}
+    if cache is not None and new_scores:
+        cache.put_many(new_scores)
+    scores.update(new_scores)
+
+    stats = {"texts": len(texts), "unique": len(unique), "cached": len(unique) - len(missing), "scored": len(missing)}
+    return [scores[key] for key in hashes], stats
+
+
+def score_frame(df, column="Summary", cache=None, workers=SENTIMENT_WORKERS):
+    """Fill df["Sentiment Score"] from df[column] in place and print what it cost"""
+    started = time.monotonic()
+    values = df[column].where(df[column].notna(), "") if column in df else pd.Series("", index=df.index)
+    df["Sentiment Score"], stats = score_texts(values.tolist(), cache, workers)
+    print(f"🧠 Sentiment: {stats['texts']} summaries, {stats['unique']} distinct, {stats['cached']} cached, "
+          f"{stats['scored']} scored in {time.monotonic() - started:.1f}s")
+    return stats
+
+
+if __name__ == "__main__":
+    from utils import parquet_store
+
+    parser = argparse.ArgumentParser(description="Re-score sentiment without re-fetching anything")
+    commands = parser.add_subparsers(dest="command", required=True)
+    store_parser = commands.add_parser("rescore", help="re-score the historical dataset in the Parquet store")
+    store_parser.add_argument("--country", help="only re-score this country (e.g. India)")
+    csv_parser = commands.add_parser("rescore-csv", help="re-score historical CSV files in place")
+    csv_parser.add_argument("paths", nargs="+")
+    for command_parser in (store_parser, csv_parser):
+        command_parser.add_argument("--workers", type=int, default=SENTIMENT_WORKERS)
+    args = parser.parse_args()
+
+    sentiment_cache = SentimentCache()
+    if args.command == "rescore":
+        stored = parquet_store.read("historical", columns=["Country"])["Country"]
+        for country in [args.country] if args.country else sorted(stored.dropna().unique()):
+            rows = parquet_store.read("historical", filter=ds.field("Country") == country)
+            if rows.empty:
+                print(f"⚠️ No stored articles for {country}")
+                continue
+            score_frame(rows, cache=sentiment_cache, workers=args.workers)
+            parquet_store.append(rows.drop(columns=["Published Month"]), "historical", replace_partitions=True)
+            print(f"✅ Re-scored {len(rows)} articles for {country}")
+    else:
+        for path in args.paths:
+            rows = pd.read_csv(path, keep_default_na=False, na_values=[""])
+            score_frame(rows, cache=sentiment_cache, workers=args.workers)
+            rows.to_csv(path, index=False, encoding="utf-8")
+            print(f"✅ Re-scored {len(rows)} articles in {path}")
@@ -0,0 +1,302 @@
+import argparse
+import os
+import sqlite3
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+from utils.http_cache import CACHE_DIR
+
+# -------------------------- AGGREGATES CONFIG --------------------------
+AGGREGATES_PATH = os.getenv("AGGREGATES_PATH", os.path.join(CACHE_DIR, "article_aggregates.sqlite3"))
+
+DIMENSIONS = ("category", "source", "country", "language", "day")
+SOURCE_COLUMNS = ("guid", "category", "source", "country", "language", "publication_date", "scraped_timestamp")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS aggregate_counts (
+    dimension TEXT NOT NULL,
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (dimension, value)
+);
+CREATE TABLE IF NOT EXISTS aggregate_members (
+    guid TEXT PRIMARY KEY,
+    category TEXT, source TEXT, country TEXT, language TEXT, day TEXT
+);
+CREATE TABLE IF NOT EXISTS aggregate_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS aggregate_counts_rebuild (
+    dimension TEXT NOT NULL,
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (dimension, value)
+);
+CREATE TABLE IF NOT EXISTS aggregate_members_rebuild (
+    guid TEXT PRIMARY KEY,
+    category TEXT, source TEXT, country TEXT, language TEXT, day TEXT
+);
+CREATE TABLE IF NOT EXISTS aggregate_replay (
+    guid TEXT,
+    category TEXT, source TEXT, country TEXT, language TEXT, day TEXT
+);
+"""
+
+# Stored for NULLs so every article lands in exactly one bucket per dimension
+MISSING = ""
+
+
+def article_day(article):
+    """Publication day (YYYY-MM-DD), falling back to the day it was scraped"""
+    for column in ("publication_date", "scraped_timestamp"):
+        value = article.get(column)
+        if not value:
+            continue
+        try:
+            return parsedate_to_datetime(value).strftime("%Y-%m-%d")
+        except (TypeError, ValueError, IndexError):
+            pass
+        try:
+            return datetime.fromisoformat(str(value).replace("Z", "+00:00")).strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    return MISSING
+
+
+def article_buckets(article):
+    """The value an article counts under in each dimension"""
+    buckets = {dimension: article.get(dimension) or MISSING for dimension in DIMENSIONS if dimension != "day"}
+    buckets["day"] = article_day(article)
+    return buckets
+
+
+class ArticleAggregates:
+    """
+    Article counts by category, source, country, language and publication day,
+    kept up to date at ingest
+
+    Each upserted article adds one to its bucket in every dimension. Articles
+    are remembered by guid, so re-upserting one moves it between buckets
+    instead of counting it twice. Reading the stats never touches the articles
+    table. Safe to share between threads, and between processes through the
+    SQLite file.
+    """
+
+    def __init__(self, path=AGGREGATES_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    @staticmethod
+    def _count(conn, rows, counts_table="aggregate_counts", members_table="aggregate_members"):
+        """Add (guid, buckets) rows to a counts / members table pair, moving known guids"""
+        deltas = Counter()
+        members = {}
+        for guid, buckets in rows:
+            previous = None
+            if guid:
+                previous = members.get(guid) or conn.execute(
+                    f"SELECT {', '.join(DIMENSIONS)} FROM {members_table} WHERE guid = ?", (guid,)
+                ).fetchone()
+                members[guid] = tuple(buckets[dimension] for dimension in DIMENSIONS)
+            if previous is None:
+                deltas[("total", MISSING)] += 1
+            else:
+                for dimension, value in zip(DIMENSIONS, previous):
+                    deltas[(dimension, value)] -= 1
+            for dimension in DIMENSIONS:
+                deltas[(dimension, buckets[dimension])] += 1
+
+        conn.executemany(
+            f"INSERT OR REPLACE INTO {members_table} (guid, {', '.join(DIMENSIONS)}) VALUES (?, ?, ?, ?, ?, ?)",
+            [(guid,) + values for guid, values in members.items()]
+        )
+        conn.executemany(
+            f"INSERT INTO {counts_table} (dimension, value, count) VALUES (?, ?, ?) "
+            "ON CONFLICT(dimension, value) DO UPDATE SET count = count + excluded.count",
+            [(dimension, value, delta) for (dimension, value), delta in deltas.items() if delta]
+        )
+        conn.execute(f"DELETE FROM {counts_table} WHERE count <= 0 AND dimension != 'total'")
+
+    def add(self, articles):
+        """
+        Count upserted articles, moving re-upserted ones to their new buckets
+
+        While a rebuild() is running they are also queued for replay on top of
+        its recount, since it may have read the articles table before they landed.
+
+        Args:
+            articles: Dicts with the news_feed column names, as just written
+        """
+        rows = [(article.get("guid"), article_buckets(article)) for article in articles]
+        with self._lock, self._conn:
+            self._count(self._conn, rows)
+            if self._conn.execute("SELECT 1 FROM aggregate_meta WHERE key = 'rebuild_started'").fetchone():
+                self._conn.executemany(
+                    f"INSERT INTO aggregate_replay (guid, {', '.join(DIMENSIONS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                    [(guid,) + tuple(buckets[dimension] for dimension in DIMENSIONS) for guid, buckets in rows]
+                )
+
+    def counts(self):
+        """
+        Current counts
+
+        Returns:
+            Dict with "total_records" and, per dimension, a list of
+            {dimension: value, "count": n}; largest first, days in date order
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT dimension, value, count FROM aggregate_counts").fetchall()
+        result = {"total_records": 0, **{dimension: [] for dimension in DIMENSIONS}}
+        for dimension, value, count in rows:
+            if dimension == "total":
+                result["total_records"] = count
+            else:
+                result[dimension].append({dimension: value or None, "count": count})
+        for dimension in DIMENSIONS:
+            if dimension == "day":
+                result[dimension].sort(key=lambda row: row["day"] or "")
+            else:
+                result[dimension].sort(key=lambda row: -row["count"])
+        return result
+
+    def raw_counts(self):
+        """Every non-zero counter as {(dimension, value): count}, for verification"""
+        with self._lock:
+            rows = self._conn.execute("SELECT dimension, value, count FROM aggregate_counts WHERE count != 0").fetchall()
+        return Counter({(dimension, value): count for dimension, value, count in rows})
+
+    def is_built(self):
+        """True once rebuild() has counted everything stored before ingest-time counting started"""
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM aggregate_meta WHERE key = 'built_at'").fetchone() is not None
+
+    def rebuild(self, articles):
+        """
+        Replace all counts with a full recount of articles
+
+        The recount goes into staging tables while the current counts keep being
+        served and updated, then replaces them in one transaction. Articles
+        ingested meanwhile are replayed on top by guid, so they are neither lost
+        nor counted twice.
+
+        Args:
+            articles: Iterable of every stored article (dicts with the news_feed column names)
+
+        Returns:
+            Number of articles counted
+        """
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM aggregate_counts_rebuild")
+            self._conn.execute("DELETE FROM aggregate_members_rebuild")
+            self._conn.execute("DELETE FROM aggregate_replay")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO aggregate_meta (key, value) VALUES ('rebuild_started', ?)",
+                (datetime.utcnow().isoformat(),)
+            )
+
+        counted = 0
+        batch = []
+        for article in articles:
+            batch.append((article.get("guid"), article_buckets(article)))
+            if len(batch) >= 5000:
+                with self._lock, self._conn:
+                    self._count(self._conn, batch, "aggregate_counts_rebuild", "aggregate_members_rebuild")
+                counted += len(batch)
+                batch = []
+
+        with self._lock, self._conn:
+            self._count(self._conn, batch, "aggregate_counts_rebuild", "aggregate_members_rebuild")
+            counted += len(batch)
+            self._conn.execute("DELETE FROM aggregate_counts")
+            self._conn.execute("DELETE FROM aggregate_members")
+            self._conn.execute("INSERT INTO aggregate_counts SELECT * FROM aggregate_counts_rebuild")
+            self._conn.execute("INSERT INTO aggregate_members SELECT * FROM aggregate_members_rebuild")
+            replay = self._conn.execute(
+                f"SELECT guid, {', '.join(DIMENSIONS)} FROM aggregate_replay ORDER BY rowid"
+            ).fetchall()
+            self._count(self._conn, [(row[0], dict(zip(DIMENSIONS, row[1:]))) for row in replay])
+            self._conn.execute("DELETE FROM aggregate_counts_rebuild")
+            self._conn.execute("DELETE FROM aggregate_members_rebuild")
+            self._conn.execute("DELETE FROM aggregate_replay")
+            self._conn.execute("DELETE FROM aggregate_meta WHERE key = 'rebuild_started'")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO aggregate_meta (key, value) VALUES ('built_at', ?)", (datetime.utcnow().isoformat(),)
+            )
+        return counted
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def recount(articles):
+    """Full recount of articles, in the same shape as the maintained counters"""
+    counts = Counter()
+    latest = {}
+    without_guid = []
+    for article in articles:
+        if article.get("guid"):
+            latest[article["guid"]] = article
+        else:
+            without_guid.append(article)
+    for article in list(latest.values()) + without_guid:
+        counts[("total", MISSING)] += 1
+        for dimension, value in article_buckets(article).items():
+            counts[(dimension, value)] += 1
+    return counts
+
+
+def stored_rows(source):
+    """Every stored article from the configured storage, or from the Parquet store"""
+    if source == "store":
+        from utils.storage import _records, stored_articles
+        yield from _records(stored_articles())
+        return
+
+    from utils.storage import create_storage
+    storage = create_storage()
+    last_id = 0
+    while True:
+        rows = storage.rows_after_id(last_id, 1000, SOURCE_COLUMNS)
+        if not rows:
+            break
+        yield from rows
+        last_id = rows[-1]["id"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest-time /api/stats counters")
+    parser.add_argument("command", choices=["rebuild", "verify", "show"])
+    parser.add_argument("--from", dest="source", choices=["storage", "store"], default="storage",
+                        help="recount the news_feed storage (default) or the Parquet store built from the CSVs")
+    args = parser.parse_args()
+
+    aggregates = ArticleAggregates()
+    if args.command == "rebuild":
+        print(f"✅ Counted {aggregates.rebuild(stored_rows(args.source))} articles")
+    elif args.command == "verify":
+        expected = recount(stored_rows(args.source))
+        actual = aggregates.raw_counts()
+        drift = {key: (actual.get(key, 0), expected.get(key, 0)) for key in set(expected) | set(actual)
+                 if actual.get(key, 0) != expected.get(key, 0)}
+        for (dimension, value), (have, want) in sorted(drift.items())[:50]:
+            print(f"❌ {dimension}={value or '(none)'}: counter {have}, recount {want}")
+        if drift:
+            print(f"❌ {len(drift)} buckets drifted, run python -m utils.stats_aggregates rebuild")
+            sys.exit(1)
+        print(f"✅ All {len(expected)} buckets match a full recount")
+    else:
+        counts = aggregates.counts()
+        print(f"📊 {counts['total_records']} articles")
+        for dimension in DIMENSIONS:
+            top = counts[dimension] if dimension != "day" else counts[dimension][-10:]
+            print(f"   {dimension}: " + ", ".join(f"{row[dimension]}={row['count']}" for row in top[:10]))
@@ -0,0 +1,314 @@
+import argparse
+import os
+import sqlite3
+import threading
+
+# -------------------------- STORAGE CONFIG --------------------------
+# "supabase" (hosted Postgres) or "sqlite" (single file, no server needed)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase").strip().lower()
+SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", os.path.join("data_store", "news_feed.sqlite3"))
+
+TABLE_NAME = "news_feed"
+COLUMNS = (
+    "title", "publication_date", "source", "news_url", "summary", "country", "author",
+    "category", "guid", "image_url", "language", "scraped_timestamp"
+)
+FILTER_COLUMNS = ("category", "source", "country", "language", "author")
+GUID_LOOKUP_CHUNK = 50  # keeps the in.(...) filter well under URL length limits
+
+
+def keyset_select(columns=None):
+    """Select list for a listing query: every column, or columns plus the (scraped_timestamp, id) sort key"""
+    if not columns:
+        return "*"
+    return ", ".join(dict.fromkeys(("id", "scraped_timestamp") + tuple(columns)))
+
+
+class SupabaseStorage:
+    """
+    news_feed table in Supabase, through the PostgREST query builder
+
+    Every method blocks on an HTTP round trip; the API runs them on its
+    database thread pool, and all threads share the client's connection pool.
+    """
+
+    name = "Supabase"
+
+    def __init__(self, url=None, key=None):
+        from supabase import create_client
+        self.client = create_client(url or os.getenv("SUPABASE_URL"), key or os.getenv("SUPABASE_ANON_KEY"))
+
+    def _table(self):
+        return self.client.table(TABLE_NAME)
+
+    @staticmethod
+    def _apply_filters(query, filters):
+        for column in FILTER_COLUMNS:
+            if filters.get(column):
+                query = query.eq(column, filters[column])
+        if filters.get("search_title"):
+            query = query.ilike("title", f"%{filters['search_title']}%")
+        return query
+
+    def count(self, filters=None, method="exact"):
+        # limit(1): the count comes back in a header, no need to ship every id
+        result = self._apply_filters(self._table().select("id", count=method), filters or {}).limit(1).execute()
+        return result.count if result.count is not None else 0
+
+    def fetch_page(self, filters=None, offset=0, limit=100, columns=None):
+        result = self._apply_filters(self._table().select(keyset_select(columns)), filters or {})\
+            .order("scraped_timestamp", desc=True)\
+            .order("id", desc=True)\
+            .range(offset, offset + limit - 1)\
+            .execute()
+        return result.data or []
+
+    def fetch_after(self, filters, position, limit, columns=None):
+        scraped_timestamp, row_id = position
+        result = self._apply_filters(self._table().select(keyset_select(columns)), filters or {})\
+            .or_(
+                f'scraped_timestamp.lt."{scraped_timestamp}",'
+                f'and(scraped_timestamp.eq."{scraped_timestamp}",id.lt.{row_id})'
+            )\
+            .order("scraped_timestamp", desc=True)\
+            .order("id", desc=True)\
+            .limit(limit)\
+            .execute()
+        return result.data or []
+
+    def fetch_by_guids(self, guids):
+        guids = list(guids)
+        rows = []
+        for start in range(0, len(guids), GUID_LOOKUP_CHUNK):
+            rows.extend(self._table().select("*").in_("guid", guids[start:start + GUID_LOOKUP_CHUNK]).execute().data or [])
+        return rows
+
+    def rows_after_id(self, last_id=0, limit=1000, columns=None):
+        result = self._table()\
+            .select(", ".join(("id",) + tuple(columns)) if columns else "*")\
+            .gt("id", last_id)\
+            .order("id")\
+            .limit(limit)\
+            .execute()
+        return result.data or []
+
+    def category_counts(self):
+        # Needs the get_category_counts / get_source_counts functions in Postgres
+        return self.client.rpc("get_category_counts").execute().data or []
+
+    def source_counts(self):
+        return self.client.rpc("get_source_counts").execute().data or []
+
+    def existing_guids(self, guids):
+        existing = set()
+        for start in range(0, len(guids), GUID_LOOKUP_CHUNK):
+            chunk = guids[start:start + GUID_LOOKUP_CHUNK]
+            result = self._table().select("guid").in_("guid", chunk).execute()
+            existing.update(row["guid"] for row in result.data or [])
+        return existing
+
+    def upsert(self, rows):
+        self._table().upsert(rows, on_conflict="guid", returning="minimal").execute()
+
+
+SQLITE_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    title TEXT,
+    publication_date TEXT,
+    source TEXT,
+    news_url TEXT,
+    summary TEXT,
+    country TEXT,
+    author TEXT,
+    category TEXT,
+    guid TEXT,
+    image_url TEXT,
+    language TEXT,
+    scraped_timestamp TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS {TABLE_NAME}_guid_idx ON {TABLE_NAME} (guid);
+CREATE INDEX IF NOT EXISTS {TABLE_NAME}_scraped_idx ON {TABLE_NAME} (scraped_timestamp DESC, id DESC);
+CREATE INDEX IF NOT EXISTS {TABLE_NAME}_country_idx ON {TABLE_NAME} (country, scraped_timestamp DESC, id DESC);
+CREATE INDEX IF NOT EXISTS {TABLE_NAME}_source_idx ON {TABLE_NAME} (source, scraped_timestamp DESC, id DESC);
+"""
+
+
+class SQLiteStorage:
+    """
+    news_feed table in a local SQLite file, with the same methods as SupabaseStorage
+
+    The listing order (scraped_timestamp, id) and the country and source filters
+    are covered by indexes, guid is unique for upserts. Each thread gets its own
+    connection; WAL mode lets the API read while a scrape writes.
+    """
+
+    name = "SQLite"
+
+    def __init__(self, path=SQLITE_DB_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
+            conn.executescript(SQLITE_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _query(self, sql, params=()):
+        return [dict(row) for row in self._conn().execute(sql, params)]
+
+    @staticmethod
+    def _where(filters, extra=()):
+        clauses = list(extra)
+        params = []
+        for column in FILTER_COLUMNS:
+            if filters.get(column):
+                clauses.append(f"{column} = ?")
+                params.append(filters[column])
+        if filters.get("search_title"):
+            clauses.append("title LIKE ?")
+            params.append(f"%{filters['search_title']}%")
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def count(self, filters=None, method="exact"):
+        # SQLite has no planner estimate to offer, so every count is exact
+        where, params = self._where(filters or {})
+        return self._conn().execute(f"SELECT count(*) FROM {TABLE_NAME}{where}", params).fetchone()[0]
+
+    def fetch_page(self, filters=None, offset=0, limit=100, columns=None):
+        where, params = self._where(filters or {})
+        return self._query(
+            f"SELECT {keyset_select(columns)} FROM {TABLE_NAME}{where} ORDER BY scraped_timestamp DESC, id DESC LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        )
+
+    def fetch_after(self, filters, position, limit, columns=None):
+        where, params = self._where(filters or {}, ["(scraped_timestamp, id) < (?, ?)"])
+        return self._query(
+            f"SELECT {keyset_select(columns)} FROM {TABLE_NAME}{where} ORDER BY scraped_timestamp DESC, id DESC LIMIT ?",
+            list(position) + params + [limit]
+        )
+
+    def fetch_by_guids(self, guids):
+        guids = list(guids)
+        if not guids:
+            return []
+        return self._query(f"SELECT * FROM {TABLE_NAME} WHERE guid IN ({', '.join('?' for _ in guids)})", guids)
+
+    def rows_after_id(self, last_id=0, limit=1000, columns=None):
+        selected = ", ".join(("id",) + tuple(columns)) if columns else "*"
+        return self._query(f"SELECT {selected} FROM {TABLE_NAME} WHERE id > ? ORDER BY id LIMIT ?", (last_id, limit))
+
+    def category_counts(self):
+        return self._query(f"SELECT category, count(*) AS count FROM {TABLE_NAME} GROUP BY category ORDER BY count DESC")
+
+    def source_counts(self):
+        return self._query(f"SELECT source, count(*) AS count FROM {TABLE_NAME} GROUP BY source ORDER BY count DESC")
+
+    def existing_guids(self, guids):
+        existing = set()
+        for start in range(0, len(guids), 500):
+            chunk = guids[start:start + 500]
+            existing.update(row["guid"] for row in self._query(
+                f"SELECT guid FROM {TABLE_NAME} WHERE guid IN ({', '.join('?' for _ in chunk)})", chunk
+            ))
+        return existing
+
+    def upsert(self, rows):
+        updates = ", ".join(f"{column} = excluded.{column}" for column in COLUMNS if column != "guid")
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                f"INSERT INTO {TABLE_NAME} ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)}) "
+                f"ON CONFLICT(guid) DO UPDATE SET {updates}",
+                [tuple(row.get(column) for column in COLUMNS) for row in rows]
+            )
+
+
+BACKENDS = {"supabase": SupabaseStorage, "sqlite": SQLiteStorage}
+
+
+def create_storage(backend=STORAGE_BACKEND):
+    """Storage for the configured backend (STORAGE_BACKEND)"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}, expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[backend]()
+
+
+# -------------------------- CORPUS IMPORT --------------------------
+def _records(df):
+    """DataFrame rows as dicts, with NaN/NaT as None and timestamps as ISO strings"""
+    df = df.astype(object).where(df.notna(), None)
+    return [{column: value.isoformat() if hasattr(value, "isoformat") else value for column, value in row.items()}
+            for row in df.to_dict("records")]
+
+
+def stored_articles():
+    """Articles in the Parquet store, mapped onto news_feed columns"""
+    # Imported here so the API, which only needs the storage classes, doesn't need pandas
+    import pandas as pd
+
+    from utils import parquet_store
+
+    scraped = parquet_store.read("rss_scraped").rename(columns={
+        "Title": "title", "Publication Date": "publication_date", "Source": "source", "News URL": "news_url",
+        "Summary": "summary", "Country": "country", "Author": "author", "Category": "category", "GUID": "guid",
+        "Image URL": "image_url", "Language": "language", "Scraped Timestamp": "scraped_timestamp"
+    })
+    # Google News links are unique per article, so they stand in for the missing guid
+    historical = parquet_store.read("historical").rename(columns={
+        "Title": "title", "Published": "publication_date", "Source": "source", "Link": "news_url",
+        "Summary": "summary", "Country": "country", "Author": "author", "Scraped Time": "scraped_timestamp"
+    })
+    historical["guid"] = historical["news_url"]
+    historical["author"] = historical["author"].replace("N/A", None)
+    articles = pd.concat([scraped, historical], ignore_index=True).reindex(columns=list(COLUMNS))
+    # An upsert batch may touch each guid only once; later rows win, as on re-scrape
+    has_guid = articles["guid"].notna()
+    return pd.concat([articles[has_guid].drop_duplicates("guid", keep="last"), articles[~has_guid]], ignore_index=True)
+
+
+def import_store(storage, batch_size=1000):
+    """Load the Parquet store (rss_scraped + historical) into storage, the search index, the stats counters and the near-duplicate clusters"""
+    from utils.near_duplicates import NearDuplicateIndex
+    from utils.search_index import SearchIndex
+    from utils.stats_aggregates import ArticleAggregates, stored_rows
+
+    rows = _records(stored_articles())
+    if not rows:
+        print("⚠️ The Parquet store is empty, run python -m utils.parquet_store backfill first")
+        return 0
+    search_index = SearchIndex()
+    near_duplicates = NearDuplicateIndex()
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        storage.upsert(batch)
+        search_index.add(batch)
+        near_duplicates.add(batch)
+    print(f"📥 Imported {len(rows)} articles into {storage.name}")
+    # Recount rather than add, so articles stored before the import are counted too
+    ArticleAggregates().rebuild(stored_rows("storage"))
+    return len(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="news_feed storage maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("import-store", help="load the Parquet store into the configured backend")
+    commands.add_parser("count", help="print the number of stored articles")
+    args = parser.parse_args()
+
+    storage = create_storage()
+    if args.command == "import-store":
+        import_store(storage)
+    else:
+        print(f"📊 {storage.count()} articles in {storage.name}")
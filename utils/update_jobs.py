@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+# -------------------------- JOB CONFIG --------------------------
+MAX_FINISHED_JOBS = int(os.getenv("UPDATE_JOB_HISTORY", "50"))  # finished jobs kept for GET /update/{job_id}
+
+
+class UpdateJobRunner:
+    """
+    Runs scrapes in-process on one background thread, one at a time
+
+    A request that arrives while a job is queued or running joins that job
+    instead of starting another scrape, so overlapping POST /update calls
+    share a single run and a single job id.
+    """
+
+    def __init__(self, run_fn, on_finished=None, max_finished=MAX_FINISHED_JOBS):
+        """
+        Args:
+            run_fn: Callable running the scrape and returning its summary; it is
+                passed on_start(feed_count) and on_feed_done(url, new_articles,
+                seconds) keyword callbacks to report progress
+            on_finished: Called with the job after every run, successful or not
+            max_finished: Number of finished jobs to keep for status lookups
+        """
+        self.run_fn = run_fn
+        self.on_finished = on_finished
+        self.max_finished = max_finished
+        self._jobs = OrderedDict()
+        self._active = None
+        self._lock = threading.Lock()
+
+    def submit(self):
+        """
+        Start a scrape, or join the one already queued or running
+
+        Returns:
+            Tuple of (job snapshot, created); created is False when the request
+            was merged into an active job
+        """
+        with self._lock:
+            if self._active is not None:
+                job = self._jobs[self._active]
+                job["merged_requests"] += 1
+                return self._snapshot(job), False
+
+            job = {
+                "job_id": uuid.uuid4().hex,
+                "status": "queued",
+                "stage": None,
+                "requested_at": datetime.utcnow().isoformat(),
+                "started_at": None,
+                "finished_at": None,
+                "duration_seconds": None,
+                "merged_requests": 0,
+                "feeds_total": None,
+                "feeds_done": 0,
+                "feeds": {},
+                "result": None,
+                "error": None
+            }
+            self._jobs[job["job_id"]] = job
+            self._active = job["job_id"]
+            self._trim()
+            snapshot = self._snapshot(job)
+
+        threading.Thread(target=self._run, args=(job,), name=f"update-{job['job_id'][:8]}", daemon=True).start()
+        return snapshot, True
+
+    def get(self, job_id):
+        """Snapshot of a job, or None if it is unknown or has aged out"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._snapshot(job) if job is not None else None
+
+    def active(self):
+        with self._lock:
+            return self._snapshot(self._jobs[self._active]) if self._active is not None else None
+
+    def _run(self, job):
+        started = time.monotonic()
+        with self._lock:
+            job["status"] = "running"
+            job["stage"] = "starting"
+            job["started_at"] = datetime.utcnow().isoformat()
+
+        def on_feed_done(url, new_articles, seconds):
+            with self._lock:
+                job["feeds"][url] = {"new_articles": new_articles, "seconds": round(seconds, 3)}
+                job["feeds_done"] += 1
+                if job["feeds_total"] is not None and job["feeds_done"] >= job["feeds_total"]:
+                    job["stage"] = "saving"
+
+        def on_start(feed_count):
+            with self._lock:
+                job["feeds_total"] = feed_count
+                job["stage"] = "fetching"
+
+        try:
+            result = self.run_fn(on_start=on_start, on_feed_done=on_feed_done)
+            with self._lock:
+                job["status"] = "succeeded"
+                job["result"] = result
+        except Exception as e:
+            traceback.print_exc()
+            with self._lock:
+                job["status"] = "failed"
+                job["error"] = str(e)
+        finally:
+            with self._lock:
+                job["stage"] = None
+                job["finished_at"] = datetime.utcnow().isoformat()
+                job["duration_seconds"] = round(time.monotonic() - started, 3)
+                self._active = None
+            if self.on_finished is not None:
+                self.on_finished(self.get(job["job_id"]))
+
+    def _trim(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job["finished_at"] is not None]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    @staticmethod
+    def _snapshot(job):
+        return {**job, "feeds": dict(job["feeds"])}